@@ -0,0 +1,43 @@
+"""Compare implementations of dispatched functionals of all backends.
+
+Usage: python benchmarks/benchmark_functional.py [n_points]
+"""
+
+import sys
+import timeit
+
+import numpy as np
+
+from volumentations.augmentations import backends
+
+N_REPEATS = 10
+
+
+def cases(n_points):
+    points = np.random.random((n_points, 3)).astype(np.float32)
+    return {
+        "crop": (lambda f: f(points, 0.1, 0.1, 0.1, 0.9, 0.9, 0.9)),
+        "scale": (lambda f: f(points, (1.01, 0.99, 1.0))),
+        "rotate_around_axis": (lambda f: f(points, (0, 0, 1), 0.01)),
+    }
+
+
+def main(n_points=1_000_000):
+    print("{} float32 points, best of {} runs, ms".format(n_points, N_REPEATS))
+    names = backends.available_backends()
+    print("{:<20}".format("functional") + "".join("{:>16}".format(b) for b in names))
+    for name, run in cases(n_points).items():
+        row = "{:<20}".format(name)
+        for backend in names:
+            implementation = backends.get_implementation(name, backend)
+            # the first call compiles JIT kernels
+            run(implementation)
+            seconds = min(
+                timeit.repeat(lambda: run(implementation), number=1, repeat=N_REPEATS)
+            )
+            row += "{:>16.2f}".format(seconds * 1000)
+        print(row)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -9,5 +9,7 @@ except PackageNotFoundError:  # pragma: no cover
 
 from .augmentations.transforms import *
 from .core.composition import *
+from .core.layout import *
 from .core.serialization import *
 from .core.transforms_interface import *
+from .materialization import *
@@ -0,0 +1,3 @@
+from .numba_functional import register_kernels
+
+register_kernels()
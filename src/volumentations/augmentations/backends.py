@@ -0,0 +1,81 @@
+"""Registry of implementations of functionals.
+
+Every dispatched functional has a reference numpy implementation. Other
+backends register faster kernels for some functionals, the active backend is
+used when it has a kernel for the called functional and numpy otherwise.
+The Numba backend is registered and activated when Numba is installed.
+"""
+
+import functools
+from typing import Callable, Dict
+
+__all__ = [
+    "available_backends",
+    "get_backend",
+    "set_backend",
+    "get_implementation",
+]
+
+
+IMPLEMENTATIONS: Dict[str, Dict[str, Callable]] = {"numpy": {}}
+_active = {"backend": "numpy"}
+
+
+def dispatch(function):
+    """Register ``function`` as the numpy implementation of a functional and
+    return the functional that calls the implementation of the active backend."""
+    name = function.__name__
+    IMPLEMENTATIONS["numpy"][name] = function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        implementation = IMPLEMENTATIONS[_active["backend"]].get(name, function)
+        return implementation(*args, **kwargs)
+
+    return wrapper
+
+
+def register(backend, name):
+    """Register decorated function as the ``backend`` implementation of ``name``."""
+
+    def decorator(function):
+        IMPLEMENTATIONS.setdefault(backend, {})[name] = function
+        return function
+
+    return decorator
+
+
+def available_backends():
+    return list(IMPLEMENTATIONS)
+
+
+def get_backend():
+    return _active["backend"]
+
+
+def set_backend(backend):
+    """Select backend used by dispatched functionals.
+
+    Args:
+        backend (str): one of ``available_backends()``.
+    """
+    if backend not in IMPLEMENTATIONS:
+        raise ValueError(
+            "Unknown backend: {}. Available backends are: {}".format(
+                backend, ", ".join(IMPLEMENTATIONS)
+            )
+        )
+    _active["backend"] = backend
+
+
+def get_implementation(name, backend=None):
+    """Implementation of functional ``name`` used by ``backend``.
+
+    Args:
+        name (str): name of the functional, ex: "crop".
+        backend (str): backend name. Default: the active backend.
+    """
+    if name not in IMPLEMENTATIONS["numpy"]:
+        raise ValueError("Functional {} is not dispatched".format(name))
+    backend = get_backend() if backend is None else backend
+    return IMPLEMENTATIONS[backend].get(name, IMPLEMENTATIONS["numpy"][name])
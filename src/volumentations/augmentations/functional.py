@@ -1,6 +1,54 @@
+import functools
+import itertools
+
 import numpy as np
 
+from ..core.utils import thread_pool
+from .backends import dispatch
+
+# rows of float16 or integer values converted to float at once
+CHUNK_SIZE = 65536
+
+
+def compute_dtype(dtype):
+    """Float dtype to compute values of ``dtype`` in, None to use ``dtype``."""
+    if dtype == np.float16:
+        return np.float32
+    if np.issubdtype(dtype, np.integer):
+        return np.float32 if dtype.itemsize <= 2 else np.float64
+    return None
+
+
+def float32_chunks(function):
+    """Run row-independent in-place ``function`` on float16 values in float32.
+
+    Rows are converted ``CHUNK_SIZE`` at a time and results are written back,
+    so float16 arrays are computed in float32 precision without a float32 copy
+    of the whole array. Integer values, e.g. uint8 colors, are computed in
+    float too and results are rounded and clipped to the range of the dtype.
+    Other dtypes are passed to ``function`` unchanged.
+    """
+
+    @functools.wraps(function)
+    def wrapper(values, *args, **kwargs):
+        dtype = compute_dtype(values.dtype)
+        if dtype is None:
+            return function(values, *args, **kwargs)
+        integer = np.issubdtype(values.dtype, np.integer)
+        if integer:
+            info = np.iinfo(values.dtype)
+        for start in range(0, len(values), CHUNK_SIZE):
+            chunk = values[start : start + CHUNK_SIZE]
+            result = function(chunk.astype(dtype), *args, **kwargs)
+            if integer:
+                result = np.clip(np.rint(result), info.min, info.max)
+            chunk[...] = result
+        return values
+
+    return wrapper
 
+
+@dispatch
 def scale(points, scale_factor=(1, 1, 1)):
     transformation_matrix = np.eye(3)
     np.fill_diagonal(transformation_matrix, scale_factor)
@@ -8,33 +56,91 @@ def scale(points, scale_factor=(1, 1, 1)):
     return points
 
 
-def rotate_around_axis(points, axis, angle, center_point=None):
+def rotation_matrix(axis, angle):
     """
     Return the rotation matrix associated with counterclockwise rotation about
     the given axis by angle in radians.
     https://stackoverflow.com/questions/6802577/rotation-of-3d-vector
     """
-    if center_point is None:
-        center_point = points[:, :3].mean(axis=0).astype(points[:, :3].dtype)
     axis = axis / np.sqrt(np.dot(axis, axis))
     a = np.cos(angle / 2.0)
     b, c, d = -axis * np.sin(angle / 2.0)
     aa, bb, cc, dd = a * a, b * b, c * c, d * d
     bc, ad, ac, ab, bd, cd = b * c, a * d, a * c, a * b, b * d, c * d
-    rotation_matrix = np.array(
+    return np.array(
         [
             [aa + bb - cc - dd, 2 * (bc + ad), 2 * (bd - ac)],
             [2 * (bc - ad), aa + cc - bb - dd, 2 * (cd + ab)],
             [2 * (bd + ac), 2 * (cd - ab), aa + dd - bb - cc],
         ]
     )
+
+
+@dispatch
+def rotate_around_axis(points, axis, angle, center_point=None):
+    if center_point is None:
+        center_point = points[:, :3].mean(axis=0).astype(points[:, :3].dtype)
+    rotation = rotation_matrix(axis, angle)
     points[:, :3] = points[:, :3] - center_point
-    points[:, :3] = np.dot(points[:, :3], rotation_matrix.T)
+    points[:, :3] = np.dot(points[:, :3], rotation.T)
     points[:, :3] = points[:, :3] + center_point
     return points
 
 
-def crop(points, x_min, y_min, z_min, x_max, y_max, z_max):
+@float32_chunks
+def rotate_vectors(vectors, axis, angle):
+    """Rotate direction vectors such as normals around axis through the origin."""
+    vectors[:, :3] = np.dot(vectors[:, :3], rotation_matrix(axis, angle).T)
+    return vectors
+
+
+def rotate_stacked(vectors, axis, angle, center_point=None):
+    """Rotate ``(N, K, 3)`` vectors in place with one matrix product.
+
+    ``vectors[:, 0]`` are points rotated around ``center_point``, the others
+    are directions such as normals.
+    """
+    if center_point is None:
+        center_point = vectors[:, 0].mean(axis=0).astype(vectors.dtype)
+    vectors[:, 0] -= center_point
+    vectors[...] = np.matmul(vectors, rotation_matrix(axis, angle).T)
+    vectors[:, 0] += center_point
+    return vectors
+
+
+def gather(values, indexes):
+    """Rows of ``values`` selected by integer ``indexes`` or a boolean mask.
+
+    While the BufferPool of the thread has an open session, rows are written
+    into a pooled array, so repeated pipeline calls reuse memory.
+    """
+    pool = thread_pool()
+    if not pool.active:
+        return values[indexes]
+    indexes = np.asarray(indexes)
+    if indexes.dtype == bool:
+        shape = (np.count_nonzero(indexes),) + values.shape[1:]
+        return np.compress(indexes, values, axis=0, out=pool.empty(shape, values.dtype))
+    indexes = indexes.astype(np.intp, copy=False)
+    if len(indexes):
+        low, high = indexes.min(), indexes.max()
+        if low < -len(values) or high >= len(values):
+            raise IndexError(
+                "Indexes from {} to {} are out of bounds for {} rows".format(
+                    low, high, len(values)
+                )
+            )
+        if low < 0:
+            indexes = np.where(indexes < 0, indexes + len(values), indexes)
+    shape = (len(indexes),) + values.shape[1:]
+    # "raise" mode buffers the output, so indexes are checked above and
+    # "clip" takes them as they are
+    return np.take(
+        values, indexes, axis=0, out=pool.empty(shape, values.dtype), mode="clip"
+    )
+
+
+def check_crop_bounds(x_min, y_min, z_min, x_max, y_max, z_max):
     if x_max <= x_min or y_max <= y_min or z_max <= z_min:
         raise ValueError(
             "We should have x_min < x_max and y_min < y_max and z_min < z_max. But we got"
@@ -48,17 +154,17 @@ def crop(points, x_min, y_min, z_min, x_max, y_max, z_max):
                 z_max=z_max,
             )
         )
-    inds = np.all(
-        [
-            (points[:, 0] >= x_min),
-            (points[:, 0] < x_max),
-            (points[:, 1] >= y_min),
-            (points[:, 1] < y_max),
-            (points[:, 2] >= z_min),
-            (points[:, 2] < z_max),
-        ],
-        axis=0,
-    )
+
+
+@dispatch
+def crop(points, x_min, y_min, z_min, x_max, y_max, z_max):
+    check_crop_bounds(x_min, y_min, z_min, x_max, y_max, z_max)
+    inds = points[:, 0] >= x_min
+    inds &= points[:, 0] < x_max
+    inds &= points[:, 1] >= y_min
+    inds &= points[:, 1] < y_max
+    inds &= points[:, 2] >= z_min
+    inds &= points[:, 2] < z_max
     return inds
 
 
@@ -72,8 +178,573 @@ def move(points, offset=(0, 0, 0)):
     return points
 
 
+def affine_matrix(linear=None, translation=None):
+    """``(4, 4)`` matrix of ``x -> linear @ x + translation``."""
+    affine = np.eye(4)
+    if linear is not None:
+        affine[:3, :3] = linear
+    if translation is not None:
+        affine[:3, 3] = translation
+    return affine
+
+
 def flip_coordinates(points, axis):
     axis = np.argmax(axis)
     coord_max = np.max(points[:, axis])
     points[:, axis] = coord_max - points[:, axis]
     return points
+
+
+def voxel_keys(points, voxel_size):
+    """Pack integer voxel coordinates of every point into a single int64 key.
+
+    Falls back to the ``(N, 3)`` voxel coordinates when the grid is too large
+    to be enumerated with int64.
+    """
+    coords = np.floor(points[:, :3] / np.asarray(voxel_size)).astype(np.int64)
+    coords -= coords.min(axis=0)
+    extent = [int(e) + 1 for e in coords.max(axis=0)]
+    if extent[0] * extent[1] * extent[2] > np.iinfo(np.int64).max:
+        return coords
+    return (
+        coords[:, 0] * (extent[1] * extent[2]) + coords[:, 1] * extent[2] + coords[:, 2]
+    )
+
+
+def voxelize(points, voxel_size):
+    """Group points by voxel.
+
+    Voxels are numbered in order of their first point, so gathering with
+    ``first`` keeps the original point order.
+
+    Returns:
+        first (np.ndarray): index of the first point of every voxel, ascending.
+        inverse (np.ndarray): voxel id of every point.
+        counts (np.ndarray): number of points in every voxel.
+    """
+    if len(points) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    keys = voxel_keys(points, voxel_size)
+    _, first, inverse, counts = np.unique(
+        keys,
+        axis=0 if keys.ndim == 2 else None,
+        return_index=True,
+        return_inverse=True,
+        return_counts=True,
+    )
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return first[order], rank[inverse.ravel()], counts[order]
+
+
+def voxel_members(inverse, counts, offsets):
+    """Pick the ``offsets[i]``-th point of every voxel ``i``."""
+    members = np.argsort(inverse, kind="stable")
+    starts = np.cumsum(counts) - counts
+    return np.sort(members[starts + offsets])
+
+
+def voxel_mean(values, inverse, counts):
+    """Average values of all points that fall into the same voxel.
+
+    float16 values are summed in chunks of rows, so they are not converted to
+    float64 weights all at once.
+    """
+    n_voxels = len(counts)
+    step = CHUNK_SIZE if values.dtype == np.float16 else max(len(values), 1)
+    columns = values.reshape(len(values), -1)
+    means = np.empty((n_voxels, columns.shape[1]), dtype=values.dtype)
+    for column in range(columns.shape[1]):
+        sums = np.zeros(n_voxels)
+        for start in range(0, len(values), step):
+            sums += np.bincount(
+                inverse[start : start + step],
+                weights=columns[start : start + step, column],
+                minlength=n_voxels,
+            )
+        means[:, column] = sums / counts
+    return means.reshape((n_voxels,) + values.shape[1:])
+
+
+@float32_chunks
+def normalize(vectors):
+    norms = np.linalg.norm(vectors[:, :3], axis=1, keepdims=True)
+    np.divide(vectors[:, :3], norms, out=vectors[:, :3], where=norms > 0)
+    return vectors
+
+
+def farthest_point_sampling(points, n_points, start=0):
+    """Iteratively pick the point farthest from all already picked points.
+
+    Keeps a running array of distances to the nearest picked point, so every
+    iteration is a handful of in-place passes over contiguous coordinate
+    columns.
+
+    Returns:
+        np.ndarray: indexes of picked points in the order they were picked.
+    """
+    x, y, z = np.array(points[:, :3].T, dtype=np.float32)
+    n_points = min(n_points, len(x))
+    indexes = np.empty(n_points, dtype=np.int64)
+    min_dist = np.full(len(x), np.inf, dtype=np.float32)
+    dist = np.empty_like(min_dist)
+    tmp = np.empty_like(min_dist)
+    index = start
+    for i in range(n_points):
+        indexes[i] = index
+        np.subtract(x, x[index], out=dist)
+        np.multiply(dist, dist, out=dist)
+        for coord in (y, z):
+            np.subtract(coord, coord[index], out=tmp)
+            np.multiply(tmp, tmp, out=tmp)
+            dist += tmp
+        np.minimum(min_dist, dist, out=min_dist)
+        index = min_dist.argmax()
+    return indexes
+
+
+def grid_sampling(points, n_points, max_iterations=16):
+    """Approximate farthest point sampling with one point per occupied voxel.
+
+    Shrinks the voxel until there are at least ``n_points`` occupied voxels.
+
+    Returns:
+        first (np.ndarray): index of the first point of every occupied voxel.
+    """
+    if n_points >= len(points):
+        return np.arange(len(points))
+    extent = np.ptp(points[:, :3], axis=0)
+    extent = np.maximum(extent, extent.max() * 1e-3 + 1e-12)
+    voxel_size = (np.prod(extent) / n_points) ** (1 / 3)
+    first = np.arange(len(points))
+    for _ in range(max_iterations):
+        first, _, _ = voxelize(points, voxel_size)
+        if len(first) >= n_points:
+            break
+        voxel_size *= 0.9 * (len(first) / n_points) ** (1 / 3)
+    return first
+
+
+def smooth_noise(noise, n_passes=2):
+    """Blur a ``(X, Y, Z, C)`` noise grid with a separable 3-tap box filter."""
+    for _ in range(n_passes):
+        for axis in range(3):
+            padding = [(0, 0)] * noise.ndim
+            padding[axis] = (1, 1)
+            padded = np.pad(noise, padding, mode="symmetric")
+            length = noise.shape[axis]
+            noise = (
+                padded.take(range(0, length), axis=axis)
+                + padded.take(range(1, length + 1), axis=axis)
+                + padded.take(range(2, length + 2), axis=axis)
+            ) / 3
+    return noise
+
+
+def trilinear_interpolation(grid, coords):
+    """Interpolate values of a ``(X, Y, Z, C)`` grid at fractional grid coordinates.
+
+    Coordinates outside of the grid are clamped to its border.
+    """
+    shape = np.array(grid.shape[:3])
+    coords = np.clip(coords, 0, shape - 1)
+    base = np.minimum(coords.astype(np.int64), np.maximum(shape - 2, 0))
+    frac = coords - base
+    weights = [(1 - frac[:, axis], frac[:, axis]) for axis in range(3)]
+    flat_grid = grid.reshape(-1, grid.shape[3])
+    strides = np.array([shape[1] * shape[2], shape[2], 1])
+    strides_or_zero = strides * (shape > 1)
+    base_index = base @ strides
+    result = np.zeros((len(coords), grid.shape[3]), dtype=grid.dtype)
+    for i, j, k in np.ndindex(2, 2, 2):
+        weight = weights[0][i] * weights[1][j] * weights[2][k]
+        offset = np.dot((i, j, k), strides_or_zero)
+        result += weight[:, None] * np.take(flat_grid, base_index + offset, axis=0)
+    return result
+
+
+def elastic_distortion(points, noise, origin, granularity, magnitude):
+    """Displace points by a smooth noise field sampled on a coarse grid.
+
+    ``noise`` is a ``(X, Y, Z, 3)`` displacement grid with spacing ``granularity``
+    whose first node is located at ``origin``.
+    """
+    coords = (points[:, :3] - origin) / granularity
+    points[:, :3] += trilinear_interpolation(noise, coords) * magnitude
+    return points
+
+
+def scale_noise(noise, sigma=1.0, clip=None):
+    """Scale and clip standard normal ``noise`` in place."""
+    noise *= sigma
+    if clip is not None:
+        np.clip(noise, -clip, clip, out=noise)
+    return noise
+
+
+def add_noise(values, noise, sigma=1.0, clip=None):
+    """Add scaled and clipped standard normal ``noise`` to ``values`` in place."""
+    values += scale_noise(noise, sigma, clip)
+    return values
+
+
+@float32_chunks
+def add_generated_noise(values, generator, sigma=1.0, clip=None):
+    """Add noise drawn from ``np.random.Generator`` to ``values`` in place.
+
+    Chunks draw consecutive parts of the same stream, so the noise equals
+    noise drawn for the whole float32 array at once.
+    """
+    noise = generator.standard_normal(values.shape, dtype=values.dtype)
+    return add_noise(values, noise, sigma, clip)
+
+
+def columns_index(columns):
+    """Index selecting ``columns``, a slice when they are consecutive.
+
+    Indexing with a slice returns a view, so selected columns can be changed in
+    place without gathering them into a new array.
+    """
+    if columns is None:
+        return slice(None)
+    columns = list(columns)
+    consecutive = all(b - a == 1 for a, b in zip(columns, columns[1:]))
+    if columns and consecutive and (columns[0] >= 0 or columns[-1] < 0):
+        stop = columns[-1] + 1
+        return slice(columns[0], stop if stop != 0 else None)
+    return columns
+
+
+def apply_to_columns(function, values, columns, *args, **kwargs):
+    """Apply in-place ``function`` to selected ``columns`` of ``values``."""
+    index = columns_index(columns)
+    selected = function(values[:, index], *args, **kwargs)
+    if not isinstance(index, slice):
+        values[:, index] = selected
+    return values
+
+
+def auto_contrast(values, blend_factor, max_value=255.0):
+    """Blend values with their per-column stretch to ``[0, max_value]``."""
+    low = values.min(axis=0).astype(np.float64)
+    high = values.max(axis=0).astype(np.float64)
+    scale = np.divide(max_value, high - low, out=np.ones(low.shape), where=high > low)
+    return scale_shift(
+        values, (1 - blend_factor) + blend_factor * scale, -blend_factor * scale * low
+    )
+
+
+@float32_chunks
+def scale_shift(values, scale, shift):
+    values *= scale
+    values += shift
+    return values
+
+
+@float32_chunks
+def translate_colors(values, offset, max_value=255.0):
+    values += offset
+    np.clip(values, 0, max_value, out=values)
+    return values
+
+
+@float32_chunks
+def scale_intensity(values, factor):
+    values *= factor
+    return values
+
+
+def symmetry_group(axes=(0, 1, 2), include_reflections=True):
+    """Enumerate axis permutations and sign flips that map the cube to itself.
+
+    Only the given ``axes`` are permuted and flipped, e.g. ``axes=(0, 1)`` gives
+    the symmetries of a square around z.
+
+    Returns:
+        list: ``(permutation, signs)`` pairs, the identity comes first.
+    """
+    axes = sorted(axes)
+    group = []
+    for axes_permutation in itertools.permutations(axes):
+        permutation = list(range(3))
+        for axis, permuted_axis in zip(axes, axes_permutation):
+            permutation[axis] = permuted_axis
+        parity = np.linalg.det(np.eye(3)[permutation])
+        for flips in itertools.product((1, -1), repeat=len(axes)):
+            signs = np.ones(3, dtype=np.int8)
+            signs[axes] = flips
+            if include_reflections or parity * np.prod(signs) > 0:
+                group.append((np.array(permutation), signs))
+    return group
+
+
+def permute_axes(points, permutation, signs):
+    np.multiply(points[:, permutation], signs, out=points[:, :3])
+    return points
+
+
+def concatenate_ranges(starts, counts):
+    """Concatenate ``range(start, start + count)`` for all pairs without a loop."""
+    ends = np.cumsum(counts)
+    return np.repeat(starts - ends + counts, counts) + np.arange(
+        ends[-1] if len(ends) else 0
+    )
+
+
+def rank_lookup(values, queries):
+    """Ranks of ``queries`` among unique ``values``, -1 for missing ones.
+
+    Returns:
+        ranks (np.ndarray): rank of every query.
+        count (int): number of unique values.
+    """
+    unique = np.unique(values)
+    ranks = np.minimum(np.searchsorted(unique, queries), len(unique) - 1)
+    return np.where(unique[ranks] == queries, ranks, -1), len(unique)
+
+
+def cell_hash_keys(coords, cells):
+    """Pack integer cell coordinates of points and query cells into int64 keys.
+
+    Query cells without points get key -1. If the grid is too large to be
+    enumerated with int64, coordinates are replaced by their ranks among
+    coordinates of points, axis by axis, so keys stay below ``len(coords) ** 2``.
+
+    Returns:
+        keys (np.ndarray): key of every point.
+        cell_keys (np.ndarray): key of every query cell.
+    """
+    low = coords.min(axis=0)
+    extent = [int(e) + 1 for e in coords.max(axis=0) - low]
+    if extent[0] * extent[1] * extent[2] <= np.iinfo(np.int64).max:
+        strides = np.array([extent[1] * extent[2], extent[2], 1])
+        cells = cells - low
+        inside = np.all((cells >= 0) & (cells < extent), axis=1)
+        cell_keys = np.full(len(cells), -1, dtype=np.int64)
+        cell_keys[inside] = cells[inside] @ strides
+        return (coords - low) @ strides, cell_keys
+    keys = np.zeros(len(coords), dtype=np.int64)
+    cell_keys = np.zeros(len(cells), dtype=np.int64)
+    for axis in range(3):
+        ranks, count = rank_lookup(coords[:, axis], coords[:, axis])
+        cell_ranks, _ = rank_lookup(coords[:, axis], cells[:, axis])
+        missing = (cell_keys < 0) | (cell_ranks < 0)
+        # keys of pairs of axes are ranked again, so they stay small
+        keys, cell_keys = keys * count + ranks, cell_keys * count + cell_ranks
+        if axis < 2:
+            keys, cell_keys = (
+                rank_lookup(keys, keys)[0],
+                rank_lookup(keys, cell_keys)[0],
+            )
+        cell_keys[missing] = -1
+    return keys, cell_keys
+
+
+def patch_dropout(points, centers, radius, shape="sphere"):
+    """Find points outside of all patches around ``centers``.
+
+    Points are hashed into cells of size ``radius``, so only the 27 cells
+    around every center are searched instead of comparing all points with all
+    centers.
+
+    Returns:
+        np.ndarray: boolean mask of points to keep.
+    """
+    keep = np.ones(len(points), dtype=bool)
+    if len(points) == 0 or len(centers) == 0:
+        return keep
+    coords = np.floor(points[:, :3] / radius).astype(np.int64)
+    centers = np.asarray(centers)[:, :3]
+    offsets = np.array(list(itertools.product((-1, 0, 1), repeat=3)))
+    cells = np.floor(centers / radius).astype(np.int64)[:, None] + offsets
+    cells = cells.reshape(-1, 3)
+    owners = np.repeat(np.arange(len(centers)), len(offsets))
+    keys, cell_keys = cell_hash_keys(coords, cells)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    # cells without points get key -1
+    valid = cell_keys >= 0
+    cell_keys = cell_keys[valid]
+    owners = owners[valid]
+    starts = np.searchsorted(sorted_keys, cell_keys, side="left")
+    counts = np.searchsorted(sorted_keys, cell_keys, side="right") - starts
+
+    candidates = order[concatenate_ranges(starts, counts)]
+    delta = points[candidates, :3] - centers[np.repeat(owners, counts)]
+    if shape == "sphere":
+        inside = np.einsum("ij,ij->i", delta, delta) <= radius**2
+    else:
+        inside = np.all(np.abs(delta) <= radius, axis=1)
+    keep[candidates[inside]] = False
+    return keep
+
+
+def nearest_points(points, center, n_points):
+    """Find ``n_points`` points nearest to ``center`` in linear time.
+
+    Returns:
+        np.ndarray: sorted indexes of the nearest points.
+    """
+    if n_points >= len(points):
+        return np.arange(len(points))
+    delta = points[:, :3] - center
+    distances = np.einsum("ij,ij->i", delta, delta)
+    return np.sort(np.argpartition(distances, n_points - 1)[:n_points])
+
+
+def window_starts(low, high, size, stride):
+    """Lower bounds of ``[start, start + size)`` windows covering ``[low, high]``."""
+    n_windows = max(1, int(np.ceil((high - low - size) / stride)) + 1)
+    if low + (n_windows - 1) * stride + size <= high:
+        n_windows += 1
+    return low + stride * np.arange(n_windows)
+
+
+def multi_crop(points, size, stride=None, min_points=1):
+    """Split point cloud into a grid of axis aligned, possibly overlapping crops.
+
+    Every axis is processed with one argsort per slab of the previous axis and
+    a ``searchsorted`` over all windows, so no full-length comparisons are
+    made per crop.
+
+    Args:
+        points (np.ndarray): point cloud.
+        size (list(float)): crop size along every axis, None to not split
+            along the axis.
+        stride (list(float)): distance between crops along every axis.
+            Default: equal to size, crops do not overlap.
+        min_points (int): minimal number of points in a crop. Default: 1.
+
+    Returns:
+        indexes (list): sorted indexes of points in every crop.
+        corners (np.ndarray): ``(K, 3)`` lower corners of crops.
+    """
+    if stride is None:
+        stride = size
+    crops = [(np.arange(len(points)), ())]
+    for axis in range(3):
+        if size[axis] is None or len(points) == 0:
+            crops = [(c, corner + (-np.inf,)) for c, corner in crops]
+            continue
+        starts = window_starts(
+            points[:, axis].min(), points[:, axis].max(), size[axis], stride[axis]
+        )
+        axis_crops = []
+        for candidates, corner in crops:
+            values = points[candidates, axis]
+            order = np.argsort(values, kind="stable")
+            sorted_values = values[order]
+            lows = np.searchsorted(sorted_values, starts, side="left")
+            highs = np.searchsorted(sorted_values, starts + size[axis], side="left")
+            for start, low, high in zip(starts, lows, highs):
+                if high - low >= min_points:
+                    axis_crops.append((candidates[order[low:high]], corner + (start,)))
+        crops = axis_crops
+    indexes = [np.sort(candidates) for candidates, _ in crops]
+    corners = np.array([corner for _, corner in crops]).reshape(-1, 3)
+    return indexes, corners
+
+
+def quantize(points, bits=21):
+    """Quantize coordinates to unsigned integers with ``bits`` bits per axis."""
+    coords = points[:, :3] - points[:, :3].min(axis=0)
+    extent = coords.max()
+    scale = ((1 << bits) - 1) / extent if extent > 0 else 0
+    return (coords * scale).astype(np.uint64)
+
+
+def spread_bits(values):
+    """Insert two zero bits between the lowest 21 bits of every value."""
+    values = values & np.uint64(0x1FFFFF)
+    for shift, mask in (
+        (32, 0x1F00000000FFFF),
+        (16, 0x1F0000FF0000FF),
+        (8, 0x100F00F00F00F00F),
+        (4, 0x10C30C30C30C30C3),
+        (2, 0x1249249249249249),
+    ):
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+def morton_codes(points, bits=21):
+    """Interleave bits of quantized coordinates into Z-order curve codes."""
+    x, y, z = quantize(points, bits).T
+    return (
+        spread_bits(x) << np.uint64(2) | spread_bits(y) << np.uint64(1) | spread_bits(z)
+    )
+
+
+def hilbert_codes(points, bits=21):
+    """Compute Hilbert curve codes with vectorized Skilling's algorithm."""
+    axes = [np.ascontiguousarray(a) for a in quantize(points, bits).T]
+    one = np.uint64(1)
+    high = np.empty_like(axes[0])
+    swap = np.empty_like(axes[0])
+    # inverse undo
+    for bit in range(bits - 1, 0, -1):
+        p = np.uint64((1 << bit) - 1)
+        for axis in axes:
+            # high is 1 where the bit is set, p is flipped in axes[0] there,
+            # otherwise the low bits of axes[0] and axis are exchanged
+            np.right_shift(axis, np.uint64(bit), out=high)
+            high &= one
+            np.bitwise_xor(axes[0], axis, out=swap)
+            swap &= p
+            swap *= one - high
+            high *= p
+            high |= swap
+            axes[0] ^= high
+            if axis is not axes[0]:
+                axis ^= swap
+    # gray encode
+    for i in range(1, len(axes)):
+        axes[i] ^= axes[i - 1]
+    t = np.zeros_like(axes[0])
+    for bit in range(bits - 1, 0, -1):
+        np.right_shift(axes[-1], np.uint64(bit), out=high)
+        high &= one
+        high *= np.uint64((1 << bit) - 1)
+        t ^= high
+    for axis in axes:
+        axis ^= t
+    return (
+        spread_bits(axes[0]) << np.uint64(2)
+        | spread_bits(axes[1]) << np.uint64(1)
+        | spread_bits(axes[2])
+    )
+
+
+def elevation_beams(points, n_beams):
+    """Assign points to ``n_beams`` equal bins of elevation angle above the sensor."""
+    if len(points) == 0:
+        return np.zeros(0, dtype=np.int64)
+    elevation = np.arctan2(points[:, 2], np.hypot(points[:, 0], points[:, 1]))
+    low, high = elevation.min(), elevation.max()
+    if high <= low:
+        return np.zeros(len(points), dtype=np.int64)
+    beams = ((elevation - low) * (n_beams / (high - low))).astype(np.int64)
+    np.minimum(beams, n_beams - 1, out=beams)
+    return beams
+
+
+def keep_beams(beams, n_kept, offset=0.0):
+    """Mask of points of ``n_kept`` evenly spaced beams of all present beams.
+
+    Args:
+        beams (np.ndarray): non-negative beam id of every point.
+        n_kept (int): number of beams to keep.
+        offset (float): position of the first kept beam in ``[0, 1)`` of the
+            spacing between kept beams.
+    """
+    if len(beams) == 0:
+        return np.zeros(0, dtype=bool)
+    present = np.flatnonzero(np.bincount(beams))
+    n_kept = min(max(n_kept, 1), len(present))
+    step = len(present) / n_kept
+    kept = present[np.floor((offset + np.arange(n_kept)) * step).astype(np.int64)]
+    table = np.zeros(present[-1] + 1, dtype=bool)
+    table[kept] = True
+    return table[beams]
@@ -0,0 +1,142 @@
+"""Numba kernels of functionals.
+
+Every kernel is a single loop over points that reads and writes each point
+once, instead of a numpy pass with a temporary array per operation. Kernels
+are compiled on the first call for every dtype and cached on disk, so worker
+processes load them instead of compiling again. float32 and float64 arrays
+are supported and other dtypes fall back to numpy.
+
+Two backends are registered: ``numba`` runs every kernel in the calling
+thread and is safe in forked data loader workers, ``numba_parallel`` splits
+kernels over all cores with ``prange``. The default Numba threading layer
+hangs processes forked after a parallel kernel ran, so use it in the main
+process only or pick another threading layer.
+"""
+
+import threading
+import types
+from typing import Optional
+
+import numpy as np
+
+from . import backends, functional as F
+
+numba: Optional[types.ModuleType]
+try:
+    import numba
+except ImportError:  # pragma: no cover
+    numba = None
+
+
+SUPPORTED_DTYPES = (np.dtype(np.float32), np.dtype(np.float64))
+
+
+def jit(function):
+    """Compile ``function`` into cached serial and parallel kernels."""
+    serial = numba.njit(cache=True)(function)
+    # a copy with its own name, so kernels are cached in separate files
+    parallel_function = types.FunctionType(
+        function.__code__, function.__globals__, function.__name__ + "_parallel"
+    )
+    parallel_function.__qualname__ = function.__qualname__ + "_parallel"
+    parallel = numba.njit(parallel=True, cache=True)(parallel_function)
+    return serial, parallel
+
+
+def numpy_fallback(name, points):
+    """Numpy implementation of ``name`` if kernels do not support ``points``."""
+    if points.dtype in SUPPORTED_DTYPES:
+        return None
+    return backends.get_implementation(name, "numpy")
+
+
+if numba is not None:
+
+    @jit
+    def crop_kernels(points, low, high):
+        mask = np.empty(points.shape[0], dtype=np.bool_)
+        for i in numba.prange(points.shape[0]):
+            inside = True
+            for axis in range(3):
+                value = points[i, axis]
+                inside = inside and low[axis] <= value and value < high[axis]
+            mask[i] = inside
+        return mask
+
+    @jit
+    def scale_kernels(points, factors):
+        for i in numba.prange(points.shape[0]):
+            for axis in range(3):
+                points[i, axis] *= factors[axis]
+
+    @jit
+    def rotate_kernels(points, rotation, center):
+        for i in numba.prange(points.shape[0]):
+            x = points[i, 0] - center[0]
+            y = points[i, 1] - center[1]
+            z = points[i, 2] - center[2]
+            for axis in range(3):
+                points[i, axis] = (
+                    rotation[axis, 0] * x
+                    + rotation[axis, 1] * y
+                    + rotation[axis, 2] * z
+                    + center[axis]
+                )
+
+
+def make_functionals(parallel):
+    """Functionals that run serial or parallel kernels."""
+
+    def select(kernels):
+        # the default threading layer cannot run parallel kernels launched
+        # from several threads at once
+        if parallel and threading.current_thread() is threading.main_thread():
+            return kernels[1]
+        return kernels[0]
+
+    def crop(points, x_min, y_min, z_min, x_max, y_max, z_max):
+        fallback = numpy_fallback("crop", points)
+        if fallback is not None:
+            return fallback(points, x_min, y_min, z_min, x_max, y_max, z_max)
+        F.check_crop_bounds(x_min, y_min, z_min, x_max, y_max, z_max)
+        low = np.array([x_min, y_min, z_min], dtype=np.float64)
+        high = np.array([x_max, y_max, z_max], dtype=np.float64)
+        return select(crop_kernels)(points, low, high)
+
+    def scale(points, scale_factor=(1, 1, 1)):
+        fallback = numpy_fallback("scale", points)
+        if fallback is not None:
+            return fallback(points, scale_factor)
+        factors = np.broadcast_to(np.asarray(scale_factor, dtype=np.float64), (3,))
+        select(scale_kernels)(points, np.ascontiguousarray(factors))
+        return points
+
+    def rotate_around_axis(points, axis, angle, center_point=None):
+        fallback = numpy_fallback("rotate_around_axis", points)
+        if fallback is not None:
+            return fallback(points, axis, angle, center_point)
+        if center_point is None:
+            center_point = points[:, :3].mean(axis=0).astype(points.dtype)
+        select(rotate_kernels)(
+            points,
+            F.rotation_matrix(axis, angle),
+            np.asarray(center_point, dtype=np.float64),
+        )
+        return points
+
+    return crop, scale, rotate_around_axis
+
+
+def register_kernels():
+    """Register Numba backends and make ``numba`` active if Numba is installed.
+
+    Returns:
+        bool: whether kernels were registered.
+    """
+    if numba is None:
+        return False
+    for backend, parallel in (("numba", False), ("numba_parallel", True)):
+        for function in make_functionals(parallel):
+            backends.register(backend, function.__name__)(function)
+    backends.set_backend("numba")
+    return True
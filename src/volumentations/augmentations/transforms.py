@@ -1,7 +1,10 @@
 import math
-import random
 
+import numpy as np
+
+from ..core.random_utils import get_np_random, get_random
 from ..core.transforms_interface import PointCloudsTransform, to_tuple
+from ..core.utils import collapse_faces, thread_buffer
 from . import functional as F
 
 __all__ = [
@@ -13,9 +16,53 @@ __all__ = [
     "Center3d",
     "RandomDropout3d",
     "Flip3d",
+    "VoxelDownsample3d",
+    "FarthestPointSample3d",
+    "ElasticDistortion3d",
+    "Jitter3d",
+    "FeatureNoise3d",
+    "ChromaticJitter3d",
+    "ChromaticAutoContrast3d",
+    "ChromaticTranslation3d",
+    "IntensityScale3d",
+    "RandomSymmetry3d",
+    "RandomPatchDropout3d",
+    "RandomCropToSize3d",
+    "MultiCrop3d",
+    "SpatialSort3d",
+    "BeamDownsample3d",
 ]
 
 
+class SubsetTransform(PointCloudsTransform):
+    """Base of transforms that keep a subset of rows of all point targets.
+
+    Subclasses compute ``indexes``, integer indexes or a boolean mask, in
+    ``get_params_dependent_on_targets`` and every target is gathered with
+    ``select``.
+    """
+
+    subsets = True
+
+    def select(self, values, indexes, **params):
+        return F.gather(values, indexes)
+
+    def apply(self, points, **params):
+        return self.select(points, **params)
+
+    def apply_to_normals(self, normals, **params):
+        return self.select(normals, **params)
+
+    def apply_to_labels(self, labels, **params):
+        return self.select(labels, **params)
+
+    def apply_to_index(self, index, **params):
+        return self.select(index, **params)
+
+    def apply_to_features(self, features, **params):
+        return self.select(features, **params)
+
+
 class Scale3d(PointCloudsTransform):
     """Scale the input point cloud.
 
@@ -34,6 +81,8 @@ class Scale3d(PointCloudsTransform):
 
     """
 
+    pointwise = True
+
     def __init__(
         self, scale_limit=(0.1, 0.1, 0.1), bias=(1, 1, 1), always_apply=False, p=0.5
     ):
@@ -45,12 +94,15 @@ class Scale3d(PointCloudsTransform):
     def get_params(self):
         scale = []
         for limit in self.scale_limit:
-            scale.append(random.uniform(limit[0], limit[1]))
+            scale.append(get_random().uniform(limit[0], limit[1]))
         return {"scale": scale}
 
     def apply(self, points, scale=(1, 1, 1), **params):
         return F.scale(points, scale)
 
+    def get_affine(self, points, scale=(1, 1, 1), **params):
+        return F.affine_matrix(np.diag(np.broadcast_to(scale, (3,))))
+
     def apply_to_normals(self, normals, **params):
         return normals
 
@@ -94,15 +146,36 @@ class RotateAroundAxis3d(PointCloudsTransform):
         self.axis = axis
         self.center_point = center_point
 
+    @property
+    def pointwise(self):
+        return self.center_point is not None
+
     def get_params(self):
-        angle = random.uniform(self.rotation_limit[0], self.rotation_limit[1])
+        angle = get_random().uniform(self.rotation_limit[0], self.rotation_limit[1])
         return {"angle": angle, "axis": self.axis, "center_point": self.center_point}
 
     def apply(self, points, axis, angle, **params):
         return F.rotate_around_axis(points, axis, angle, center_point=self.center_point)
 
     def apply_to_normals(self, normals, axis, angle, **params):
-        return F.rotate_around_axis(normals, axis, angle, center_point=(0, 0, 0))
+        return F.rotate_vectors(normals, axis, angle)
+
+    def get_affine(self, points, axis, angle, **params):
+        center_point = self.center_point
+        if center_point is None:
+            if points is None:
+                return None
+            center_point = points[:, :3].mean(axis=0).astype(points.dtype)
+        rotation = F.rotation_matrix(axis, angle)
+        center_point = np.asarray(center_point, dtype=np.float64)
+        return F.affine_matrix(rotation, center_point - rotation @ center_point)
+
+    def apply_to_cloud(self, cloud, axis, angle, **params):
+        vectors = self.layout.stacked(cloud, "points", "normals")
+        if vectors is None:
+            return super().apply_to_cloud(cloud, axis=axis, angle=angle, **params)
+        F.rotate_stacked(vectors, axis, angle, center_point=self.center_point)
+        return cloud
 
     def apply_to_features(self, features, **params):
         return features
@@ -117,7 +190,7 @@ class RotateAroundAxis3d(PointCloudsTransform):
         }
 
 
-class Crop3d(PointCloudsTransform):
+class Crop3d(SubsetTransform):
     """Crop region from image.
 
     Args:
@@ -173,18 +246,6 @@ class Crop3d(PointCloudsTransform):
             )
         }
 
-    def apply(self, points, indexes, **params):
-        return points[indexes]
-
-    def apply_to_normals(self, normals, indexes, **params):
-        return normals[indexes]
-
-    def apply_to_labels(self, labels, indexes, **params):
-        return labels[indexes]
-
-    def apply_to_features(self, features, indexes, **params):
-        return features[indexes]
-
     def get_transform_init_args_names(self):
         return ("x_min", "y_min", "z_min", "x_max", "y_max", "z_max")
 
@@ -210,6 +271,11 @@ class Center3d(PointCloudsTransform):
     def apply(self, points, **params):
         return F.move(F.center(points), self.offset)
 
+    def get_affine(self, points, **params):
+        if points is None:
+            return None
+        return F.affine_matrix(translation=self.offset - points[:, :3].mean(axis=0))
+
     def apply_to_normals(self, normals, **params):
         return normals
 
@@ -240,6 +306,8 @@ class Move3d(PointCloudsTransform):
 
     """
 
+    pointwise = True
+
     def __init__(self, offset=(0, 0, 0), always_apply=False, p=1.0):
         super().__init__(always_apply, p)
         self.offset = offset
@@ -250,6 +318,9 @@ class Move3d(PointCloudsTransform):
     def apply(self, points, offset, **params):
         return F.move(points, offset)
 
+    def get_affine(self, points, offset, **params):
+        return F.affine_matrix(translation=offset)
+
     def apply_to_normals(self, normals, **params):
         return normals
 
@@ -307,9 +378,9 @@ class RandomMove3d(Move3d):
 
     def get_params(self):
         offset = [
-            random.uniform(self.x_min, self.x_max),
-            random.uniform(self.y_min, self.y_max),
-            random.uniform(self.z_min, self.z_max),
+            get_random().uniform(self.x_min, self.x_max),
+            get_random().uniform(self.y_min, self.y_max),
+            get_random().uniform(self.z_min, self.z_max),
         ]
         return {"offset": offset}
 
@@ -325,7 +396,7 @@ class RandomMove3d(Move3d):
         }
 
 
-class RandomDropout3d(PointCloudsTransform):
+class RandomDropout3d(SubsetTransform):
     """Randomly drop points from point cloud.
 
     Args:
@@ -340,6 +411,8 @@ class RandomDropout3d(PointCloudsTransform):
 
     """
 
+    subsamples_uniformly = True
+
     def __init__(self, dropout_ratio=0.2, always_apply=False, p=0.5):
         super().__init__(always_apply, p)
         self.dropout_ratio = dropout_ratio
@@ -350,24 +423,12 @@ class RandomDropout3d(PointCloudsTransform):
 
     def get_params_dependent_on_targets(self, params):
         points_len = len(params["points"])
-        indexes = random.sample(
+        indexes = get_random().sample(
             range(points_len), k=int(points_len * (1 - self.dropout_ratio))
         )
         sorted_indexes = sorted(indexes)
         return {"indexes": sorted_indexes}
 
-    def apply(self, points, indexes, **params):
-        return points[indexes]
-
-    def apply_to_normals(self, normals, indexes, **params):
-        return normals[indexes]
-
-    def apply_to_labels(self, labels, indexes, **params):
-        return labels[indexes]
-
-    def apply_to_features(self, features, indexes, **params):
-        return features[indexes]
-
     def get_transform_init_args(self):
         return {"dropout_ratio": self.dropout_ratio}
 
@@ -396,6 +457,16 @@ class Flip3d(PointCloudsTransform):
         points = F.flip_coordinates(points, self.axis)
         return points
 
+    def get_affine(self, points, **params):
+        if points is None:
+            return None
+        axis = np.argmax(self.axis)
+        linear = np.eye(3)
+        linear[axis, axis] = -1
+        translation = np.zeros(3)
+        translation[axis] = np.max(points[:, axis])
+        return F.affine_matrix(linear, translation)
+
     def apply_to_normals(self, normals, **params):
         normals[:, self.axis] = -normals[:, self.axis]
         return normals
@@ -408,3 +479,817 @@ class Flip3d(PointCloudsTransform):
 
     def get_transform_init_args(self):
         return {"axis": self.axis}
+
+
+class VoxelDownsample3d(SubsetTransform):
+    """Keep a single point per voxel of a regular grid.
+
+    Args:
+        voxel_size (float or (float, float, float)): size of the voxel. Default: 0.05.
+        reduce (str): how to reduce points that fall into the same voxel.
+            ``"first"`` keeps the first point, ``"random"`` keeps a random point
+            and ``"mean"`` averages points, normals and features while labels
+            are taken from the first point. Default: "first".
+        p (float): probability of applying the transform. Default: 1.0.
+
+    Targets:
+        points
+        normals
+        features
+        labels
+
+    """
+
+    def __init__(self, voxel_size=0.05, reduce="first", always_apply=False, p=1.0):
+        super().__init__(always_apply, p)
+        if reduce not in {"first", "random", "mean"}:
+            raise ValueError(
+                "Unknown reduce value: {}. Supported values are: "
+                "'first', 'random' and 'mean'".format(reduce)
+            )
+        self.voxel_size = voxel_size
+        self.reduce = reduce
+
+    @property
+    def subsets(self):
+        return self.reduce != "mean"
+
+    @property
+    def targets_as_params(self):
+        return ["points"]
+
+    def get_params_dependent_on_targets(self, params):
+        indexes, inverse, counts = F.voxelize(params["points"], self.voxel_size)
+        if self.reduce == "random":
+            offsets = (get_np_random().random(len(counts)) * counts).astype(np.int64)
+            indexes = F.voxel_members(inverse, counts, offsets)
+        return {"indexes": indexes, "inverse": inverse, "counts": counts}
+
+    def apply(self, points, indexes, inverse, counts, **params):
+        if self.reduce == "mean":
+            return F.voxel_mean(points, inverse, counts)
+        return self.select(points, indexes)
+
+    def apply_to_normals(self, normals, indexes, inverse, counts, **params):
+        if self.reduce == "mean":
+            return F.normalize(F.voxel_mean(normals, inverse, counts))
+        return self.select(normals, indexes)
+
+    def apply_to_features(self, features, indexes, inverse, counts, **params):
+        if self.reduce == "mean":
+            return F.voxel_mean(features, inverse, counts)
+        return self.select(features, indexes)
+
+    def apply_to_faces(self, faces, indexes, inverse, counts, **params):
+        if self.reduce != "mean":
+            # gathered rows are in point order, which is not the voxel order
+            # when a random point of every voxel is kept
+            rows = np.empty(len(counts), dtype=np.int64)
+            rows[inverse[indexes]] = np.arange(len(indexes))
+            inverse = rows[inverse]
+        return collapse_faces(faces, inverse)
+
+    def get_transform_init_args_names(self):
+        return ("voxel_size", "reduce")
+
+
+class FarthestPointSample3d(SubsetTransform):
+    """Sample a fixed number of well spread points.
+
+    Args:
+        n_points (int): number of points to keep. If the point cloud has fewer
+            points, all of them are kept. Default: 4096.
+        method (str): ``"exact"`` runs farthest point sampling from a random
+            start point, ``"grid"`` approximates it by keeping one point per
+            voxel of an adaptively sized grid and is much faster on large
+            point clouds. Default: "exact".
+        p (float): probability of applying the transform. Default: 1.0.
+
+    Targets:
+        points
+        normals
+        features
+        labels
+
+    """
+
+    def __init__(self, n_points=4096, method="exact", always_apply=False, p=1.0):
+        super().__init__(always_apply, p)
+        if method not in {"exact", "grid"}:
+            raise ValueError(
+                "Unknown method value: {}. Supported values are: "
+                "'exact' and 'grid'".format(method)
+            )
+        self.n_points = n_points
+        self.method = method
+
+    @property
+    def targets_as_params(self):
+        return ["points"]
+
+    def get_params_dependent_on_targets(self, params):
+        points = params["points"]
+        if self.method == "exact":
+            start = get_random().randrange(len(points)) if len(points) else 0
+            indexes = F.farthest_point_sampling(points, self.n_points, start=start)
+            return {"indexes": indexes}
+        indexes = F.grid_sampling(points, self.n_points)
+        if len(indexes) > self.n_points:
+            keep = get_np_random().choice(len(indexes), self.n_points, replace=False)
+            indexes = indexes[np.sort(keep)]
+        elif len(indexes) < min(self.n_points, len(points)):
+            rest = np.setdiff1d(np.arange(len(points)), indexes, assume_unique=True)
+            extra = get_np_random().choice(
+                rest, self.n_points - len(indexes), replace=False
+            )
+            indexes = np.sort(np.concatenate([indexes, extra]))
+        return {"indexes": indexes}
+
+    def get_transform_init_args_names(self):
+        return ("n_points", "method")
+
+
+class ElasticDistortion3d(PointCloudsTransform):
+    """Apply smooth non-rigid distortion to the point cloud.
+
+    Random displacements are drawn on a coarse grid, smoothed and trilinearly
+    interpolated at every point.
+
+    Args:
+        granularity (float): spacing of the displacement grid. Default: 0.2.
+        magnitude (float): scale of the displacements. Default: 0.4.
+        p (float): probability of applying the transform. Default: 0.5.
+
+    Targets:
+        points
+        normals
+        features
+        labels
+
+    """
+
+    def __init__(self, granularity=0.2, magnitude=0.4, always_apply=False, p=0.5):
+        super().__init__(always_apply, p)
+        self.granularity = granularity
+        self.magnitude = magnitude
+
+    @property
+    def targets_as_params(self):
+        return ["points"]
+
+    def get_params_dependent_on_targets(self, params):
+        points = params["points"][:, :3]
+        if len(points) == 0:
+            return {"noise": np.zeros((1, 1, 1, 3)), "origin": np.zeros(3)}
+        coords_min = points.min(axis=0)
+        noise_dim = ((points.max(axis=0) - coords_min) // self.granularity).astype(
+            int
+        ) + 3
+        noise = F.smooth_noise(get_np_random().randn(*noise_dim, 3))
+        return {"noise": noise, "origin": coords_min - self.granularity}
+
+    def apply(self, points, noise, origin, **params):
+        return F.elastic_distortion(
+            points, noise, origin, self.granularity, self.magnitude
+        )
+
+    def apply_to_normals(self, normals, **params):
+        return normals
+
+    def apply_to_features(self, features, **params):
+        return features
+
+    def apply_to_labels(self, labels, **params):
+        return labels
+
+    def get_transform_init_args_names(self):
+        return ("granularity", "magnitude")
+
+
+class Jitter3d(PointCloudsTransform):
+    """Add gaussian noise to point coordinates.
+
+    Noise is drawn into a scratch buffer of the calling thread that grows
+    with the largest point cloud seen, so no new array is allocated per call.
+    float16 and integer values get noise drawn in float32 chunks instead.
+
+    Args:
+        sigma (float): standard deviation of the noise. Default: 0.01.
+        clip (float): maximum absolute value of the noise, None to disable
+            clipping. Default: 0.05.
+        p (float): probability of applying the transform. Default: 0.5.
+
+    Targets:
+        points
+        normals
+        features
+        labels
+
+    """
+
+    pointwise = True
+
+    def __init__(self, sigma=0.01, clip=0.05, always_apply=False, p=0.5):
+        super().__init__(always_apply, p)
+        self.sigma = sigma
+        self.clip = clip
+
+    def get_params(self):
+        return {"seed": get_random().randint(0, 2**32 - 1)}
+
+    def draw_noise(self, shape, dtype, seed):
+        dtype = np.float32 if dtype == np.float32 else np.float64
+        noise = thread_buffer("noise", int(np.prod(shape)), dtype).reshape(shape)
+        np.random.default_rng(seed).standard_normal(dtype=dtype, out=noise)
+        return noise
+
+    def perturb(self, values, seed):
+        if values.dtype not in (np.float32, np.float64):
+            generator = np.random.default_rng(seed)
+            return F.add_generated_noise(values, generator, self.sigma, self.clip)
+        noise = self.draw_noise(values.shape, values.dtype, seed)
+        return F.add_noise(values, noise, self.sigma, self.clip)
+
+    def apply(self, points, seed, **params):
+        self.perturb(points[:, :3], seed)
+        return points
+
+    def apply_to_normals(self, normals, **params):
+        return normals
+
+    def apply_to_features(self, features, **params):
+        return features
+
+    def apply_to_labels(self, labels, **params):
+        return labels
+
+    def get_transform_init_args_names(self):
+        return ("sigma", "clip")
+
+
+class FeatureNoise3d(Jitter3d):
+    """Add gaussian noise to point features.
+
+    Args:
+        sigma (float): standard deviation of the noise. Default: 0.01.
+        clip (float): maximum absolute value of the noise, None to disable
+            clipping. Default: None.
+        columns (list(int)): feature columns to add noise to. Default: all columns.
+        p (float): probability of applying the transform. Default: 0.5.
+
+    Targets:
+        points
+        normals
+        features
+        labels
+
+    """
+
+    def __init__(self, sigma=0.01, clip=None, columns=None, always_apply=False, p=0.5):
+        super().__init__(sigma, clip, always_apply, p)
+        self.columns = columns
+
+    def apply(self, points, **params):
+        return points
+
+    def get_affine(self, points, **params):
+        return np.eye(4)
+
+    def apply_to_features(self, features, seed, **params):
+        return F.apply_to_columns(self.perturb, features, self.columns, seed=seed)
+
+    def get_transform_init_args_names(self):
+        return ("sigma", "clip", "columns")
+
+
+class ChromaticJitter3d(FeatureNoise3d):
+    """Add gaussian noise to colors.
+
+    Args:
+        std (float): standard deviation of the noise relative to ``max_value``.
+            Default: 0.01.
+        max_value (float): maximum color value, colors are clipped to
+            ``[0, max_value]``. Default: 255.
+        columns (list(int)): feature columns with colors. Default: (0, 1, 2).
+        p (float): probability of applying the transform. Default: 0.5.
+
+    Targets:
+        points
+        normals
+        features
+        labels
+
+    """
+
+    def __init__(
+        self, std=0.01, max_value=255.0, columns=(0, 1, 2), always_apply=False, p=0.5
+    ):
+        super().__init__(std * max_value, None, columns, always_apply, p)
+        self.std = std
+        self.max_value = max_value
+
+    def perturb(self, values, seed):
+        values = super().perturb(values, seed)
+        # integer colors are clipped to max_value that is within their range
+        np.clip(values, 0, self.max_value, out=values, casting="unsafe")
+        return values
+
+    def get_transform_init_args_names(self):
+        return ("std", "max_value", "columns")
+
+
+class ChromaticAutoContrast3d(PointCloudsTransform):
+    """Blend colors with their auto contrasted version.
+
+    Args:
+        blend_factor (float): weight of the auto contrasted colors.
+            Default: random in [0, 1).
+        max_value (float): maximum color value. Default: 255.
+        columns (list(int)): feature columns with colors. Default: (0, 1, 2).
+        p (float): probability of applying the transform. Default: 0.2.
+
+    Targets:
+        points
+        normals
+        features
+        labels
+
+    """
+
+    def __init__(
+        self,
+        blend_factor=None,
+        max_value=255.0,
+        columns=(0, 1, 2),
+        always_apply=False,
+        p=0.2,
+    ):
+        super().__init__(always_apply, p)
+        self.blend_factor = blend_factor
+        self.max_value = max_value
+        self.columns = columns
+
+    def get_params(self):
+        if self.blend_factor is None:
+            return {"blend_factor": get_random().random()}
+        return {"blend_factor": self.blend_factor}
+
+    def apply(self, points, **params):
+        return points
+
+    def get_affine(self, points, **params):
+        return np.eye(4)
+
+    def apply_to_normals(self, normals, **params):
+        return normals
+
+    def apply_to_features(self, features, blend_factor, **params):
+        if len(features) == 0:
+            return features
+        return F.apply_to_columns(
+            F.auto_contrast, features, self.columns, blend_factor, self.max_value
+        )
+
+    def apply_to_labels(self, labels, **params):
+        return labels
+
+    def get_transform_init_args_names(self):
+        return ("blend_factor", "max_value", "columns")
+
+
+class ChromaticTranslation3d(PointCloudsTransform):
+    """Shift colors on a random offset.
+
+    Args:
+        translation_ratio (float): maximum offset relative to ``max_value``.
+            Default: 0.1.
+        max_value (float): maximum color value, colors are clipped to
+            ``[0, max_value]``. Default: 255.
+        columns (list(int)): feature columns with colors, if None a single
+            offset is added to all columns. Default: (0, 1, 2).
+        p (float): probability of applying the transform. Default: 0.5.
+
+    Targets:
+        points
+        normals
+        features
+        labels
+
+    """
+
+    pointwise = True
+
+    def __init__(
+        self,
+        translation_ratio=0.1,
+        max_value=255.0,
+        columns=(0, 1, 2),
+        always_apply=False,
+        p=0.5,
+    ):
+        super().__init__(always_apply, p)
+        self.translation_ratio = translation_ratio
+        self.max_value = max_value
+        self.columns = columns
+
+    def get_params(self):
+        limit = self.translation_ratio * self.max_value
+        n_columns = 1 if self.columns is None else len(self.columns)
+        return {
+            "offset": [get_random().uniform(-limit, limit) for _ in range(n_columns)]
+        }
+
+    def apply(self, points, **params):
+        return points
+
+    def get_affine(self, points, **params):
+        return np.eye(4)
+
+    def apply_to_normals(self, normals, **params):
+        return normals
+
+    def apply_to_features(self, features, offset, **params):
+        return F.apply_to_columns(
+            F.translate_colors, features, self.columns, offset, self.max_value
+        )
+
+    def apply_to_labels(self, labels, **params):
+        return labels
+
+    def get_transform_init_args_names(self):
+        return ("translation_ratio", "max_value", "columns")
+
+
+class IntensityScale3d(PointCloudsTransform):
+    """Scale intensity features on a random factor.
+
+    Args:
+        scale_limit (float or (float, float)): maximum deviation of the scaling
+            factor from 1. Default: 0.1.
+        columns (list(int)): feature columns to scale. Default: all columns.
+        p (float): probability of applying the transform. Default: 0.5.
+
+    Targets:
+        points
+        normals
+        features
+        labels
+
+    """
+
+    pointwise = True
+
+    def __init__(self, scale_limit=0.1, columns=None, always_apply=False, p=0.5):
+        super().__init__(always_apply, p)
+        self.scale_limit = to_tuple(scale_limit, bias=1)
+        self.columns = columns
+
+    def get_params(self):
+        return {
+            "factor": get_random().uniform(self.scale_limit[0], self.scale_limit[1])
+        }
+
+    def apply(self, points, **params):
+        return points
+
+    def get_affine(self, points, **params):
+        return np.eye(4)
+
+    def apply_to_normals(self, normals, **params):
+        return normals
+
+    def apply_to_features(self, features, factor, **params):
+        return F.apply_to_columns(F.scale_intensity, features, self.columns, factor)
+
+    def apply_to_labels(self, labels, **params):
+        return labels
+
+    def get_transform_init_args(self):
+        return {
+            "scale_limit": to_tuple(self.scale_limit, bias=-1),
+            "columns": self.columns,
+        }
+
+
+class RandomSymmetry3d(PointCloudsTransform):
+    """Apply random 90 degree rotation and flip around the origin.
+
+    Symmetries are precomputed axis permutations with sign flips, so they are
+    applied exactly without a rotation matrix.
+
+    Args:
+        axes (list(int)): axes to permute and flip, (0, 1, 2) gives all 48
+            symmetries of the cube, (0, 1) gives 8 symmetries around z axis.
+            Default: (0, 1, 2).
+        include_reflections (bool): whether to include symmetries that change
+            handedness. Default: True.
+        p (float): probability of applying the transform. Default: 0.5.
+
+    Targets:
+        points
+        normals
+        features
+        labels
+
+    """
+
+    pointwise = True
+
+    def __init__(
+        self, axes=(0, 1, 2), include_reflections=True, always_apply=False, p=0.5
+    ):
+        super().__init__(always_apply, p)
+        self.axes = axes
+        self.include_reflections = include_reflections
+        self.group = F.symmetry_group(axes, include_reflections)
+
+    def get_params(self):
+        return {"element": get_random().randrange(len(self.group))}
+
+    def apply(self, points, element, **params):
+        return F.permute_axes(points, *self.group[element])
+
+    def get_affine(self, points, element, **params):
+        permutation, signs = self.group[element]
+        linear = np.zeros((3, 3))
+        linear[np.arange(3), permutation] = signs
+        return F.affine_matrix(linear)
+
+    def apply_to_normals(self, normals, element, **params):
+        return F.permute_axes(normals, *self.group[element])
+
+    def apply_to_features(self, features, **params):
+        return features
+
+    def apply_to_labels(self, labels, **params):
+        return labels
+
+    def get_transform_init_args_names(self):
+        return ("axes", "include_reflections")
+
+
+class RandomPatchDropout3d(SubsetTransform):
+    """Drop all points in patches around random points of the point cloud.
+
+    Args:
+        n_patches (int): number of patches to drop. Default: 5.
+        radius (float): radius of a sphere or half size of a cube patch.
+            Default: 0.5.
+        shape (str): shape of patches, ``"sphere"`` or ``"cube"``.
+            Default: "sphere".
+        p (float): probability of applying the transform. Default: 0.5.
+
+    Targets:
+        points
+        normals
+        features
+        labels
+
+    """
+
+    def __init__(
+        self, n_patches=5, radius=0.5, shape="sphere", always_apply=False, p=0.5
+    ):
+        super().__init__(always_apply, p)
+        if shape not in {"sphere", "cube"}:
+            raise ValueError(
+                "Unknown shape value: {}. Supported values are: "
+                "'sphere' and 'cube'".format(shape)
+            )
+        self.n_patches = n_patches
+        self.radius = radius
+        self.shape = shape
+
+    @property
+    def targets_as_params(self):
+        return ["points"]
+
+    def get_params_dependent_on_targets(self, params):
+        points = params["points"]
+        centers = get_random().sample(
+            range(len(points)), k=min(self.n_patches, len(points))
+        )
+        return {
+            "indexes": F.patch_dropout(
+                points, points[centers], self.radius, shape=self.shape
+            )
+        }
+
+    def get_transform_init_args_names(self):
+        return ("n_patches", "radius", "shape")
+
+
+class RandomCropToSize3d(SubsetTransform):
+    """Crop a fixed number of points nearest to a random point.
+
+    Args:
+        n_points (int): number of points in the crop. If the point cloud has
+            fewer points, random points are repeated to get exactly ``n_points``.
+            Default: 4096.
+        p (float): probability of applying the transform. Default: 1.0.
+
+    Targets:
+        points
+        normals
+        features
+        labels
+
+    """
+
+    def __init__(self, n_points=4096, always_apply=False, p=1.0):
+        super().__init__(always_apply, p)
+        self.n_points = n_points
+
+    @property
+    def targets_as_params(self):
+        return ["points"]
+
+    def get_params_dependent_on_targets(self, params):
+        points = params["points"]
+        if len(points) == 0:
+            return {"indexes": np.arange(0)}
+        if len(points) < self.n_points:
+            extra = get_np_random().randint(
+                len(points), size=self.n_points - len(points)
+            )
+            return {"indexes": np.sort(np.concatenate([np.arange(len(points)), extra]))}
+        center = points[get_random().randrange(len(points)), :3]
+        return {"indexes": F.nearest_points(points, center, self.n_points)}
+
+    def get_transform_init_args_names(self):
+        return ("n_points",)
+
+
+class MultiCrop3d(SubsetTransform):
+    """Split point cloud into a grid of axis aligned crops.
+
+    Every target becomes a list with a crop per grid cell, so the transform
+    should be the last one in the pipeline.
+
+    Args:
+        size (list(float)): crop size along x, y and z, None to not split along
+            an axis. Default: (10, 10, None).
+        stride (list(float)): distance between crops along every axis, smaller
+            than size for overlapping crops. Default: equal to size.
+        min_points (int): crops with fewer points are dropped. Default: 1.
+        p (float): probability of applying the transform. Default: 1.0.
+
+    Targets:
+        points
+        normals
+        features
+        labels
+
+    """
+
+    def __init__(
+        self,
+        size=(10.0, 10.0, None),
+        stride=None,
+        min_points=1,
+        always_apply=False,
+        p=1.0,
+    ):
+        super().__init__(always_apply, p)
+        self.size = size
+        self.stride = stride
+        self.min_points = min_points
+
+    @property
+    def targets_as_params(self):
+        return ["points"]
+
+    def get_params_dependent_on_targets(self, params):
+        crops, _ = F.multi_crop(
+            params["points"], self.size, self.stride, min_points=self.min_points
+        )
+        return {"crops": crops}
+
+    def select(self, values, crops, **params):
+        # crops are returned in lists, which Compose does not copy out of
+        # pooled buffers, so they are indexed without F.gather
+        return [values[indexes] for indexes in crops]
+
+    def get_transform_init_args_names(self):
+        return ("size", "stride", "min_points")
+
+
+class SpatialSort3d(SubsetTransform):
+    """Reorder points along a space filling curve.
+
+    Points that are close in space end up close in memory, which speeds up
+    neighbour search and sparse convolutions downstream.
+
+    Args:
+        order (str): space filling curve, ``"morton"`` (Z-order) or ``"hilbert"``.
+            Default: "morton".
+        bits (int): number of bits per axis used to quantize coordinates, at
+            most 21. Default: 21.
+        p (float): probability of applying the transform. Default: 1.0.
+
+    Targets:
+        points
+        normals
+        features
+        labels
+
+    """
+
+    def __init__(self, order="morton", bits=21, always_apply=False, p=1.0):
+        super().__init__(always_apply, p)
+        if order not in {"morton", "hilbert"}:
+            raise ValueError(
+                "Unknown order value: {}. Supported values are: "
+                "'morton' and 'hilbert'".format(order)
+            )
+        if not 1 <= bits <= 21:
+            raise ValueError(
+                "bits must be in [1, 21] to fit codes of 3 axes into 64 bits, "
+                "got {}".format(bits)
+            )
+        self.order = order
+        self.bits = bits
+
+    @property
+    def targets_as_params(self):
+        return ["points"]
+
+    def get_params_dependent_on_targets(self, params):
+        points = params["points"]
+        if len(points) == 0:
+            return {"indexes": np.arange(0)}
+        if self.order == "morton":
+            codes = F.morton_codes(points, self.bits)
+        else:
+            codes = F.hilbert_codes(points, self.bits)
+        return {"indexes": np.argsort(codes, kind="stable")}
+
+    def get_transform_init_args_names(self):
+        return ("order", "bits")
+
+
+class BeamDownsample3d(SubsetTransform):
+    """Drop whole LiDAR beams to simulate a sensor with fewer beams.
+
+    Beams are read from a ring index feature column or, without it, points
+    are binned by elevation angle into ``n_beams`` equal bins. Evenly spaced
+    beams are kept, starting from a random one.
+
+    Args:
+        keep_ratio (float): fraction of beams to keep. Default: 0.5.
+        target_beams (int): number of beams to keep, overrides ``keep_ratio``.
+            Default: None.
+        ring_column (int): feature column with the ring index of every point,
+            None to bin elevation angles. Default: None.
+        n_beams (int): number of beams of the sensor, used to bin elevation
+            angles. Default: 64.
+        p (float): probability of applying the transform. Default: 1.0.
+
+    Targets:
+        points
+        normals
+        features
+        labels
+
+    """
+
+    def __init__(
+        self,
+        keep_ratio=0.5,
+        target_beams=None,
+        ring_column=None,
+        n_beams=64,
+        always_apply=False,
+        p=1.0,
+    ):
+        super().__init__(always_apply, p)
+        if target_beams is None and not 0 < keep_ratio <= 1:
+            raise ValueError(
+                "keep_ratio should be in (0, 1], got {}".format(keep_ratio)
+            )
+        self.keep_ratio = keep_ratio
+        self.target_beams = target_beams
+        self.ring_column = ring_column
+        self.n_beams = n_beams
+
+    @property
+    def targets_as_params(self):
+        if self.ring_column is None:
+            return ["points"]
+        return ["points", "features"]
+
+    def get_params_dependent_on_targets(self, params):
+        if self.ring_column is None:
+            beams = F.elevation_beams(params["points"], self.n_beams)
+        else:
+            beams = params["features"][:, self.ring_column].astype(np.int64)
+        if self.target_beams is not None:
+            n_kept = self.target_beams
+        else:
+            n_present = np.count_nonzero(np.bincount(beams)) if len(beams) else 0
+            n_kept = int(round(n_present * self.keep_ratio))
+        mask = F.keep_beams(beams, n_kept, get_random().random())
+        return {"indexes": mask}
+
+    def get_transform_init_args_names(self):
+        return ("keep_ratio", "target_beams", "ring_column", "n_beams")
@@ -1,16 +1,24 @@
-import random
+import bisect
+import itertools
 from collections import defaultdict
 
 import numpy as np
+from volumentations.core import random_utils
+from volumentations.core.layout import PointLayout
+from volumentations.core.random_utils import get_np_random, get_random
 from volumentations.core.serialization import SERIALIZABLE_REGISTRY, SerializableMeta
 from volumentations.core.six import add_metaclass
-from volumentations.core.utils import format_args
+from volumentations.core.utils import format_args, thread_pool
 
 __all__ = [
     "Compose",
     "OneOf",
     "OneOrOther",
+    "SomeOf",
+    "RandomOrder",
     "ReplayCompose",
+    "SequenceCompose",
+    "TTACompose",
 ]
 
 
@@ -37,18 +45,191 @@ class Transforms:
         return dual_start_end
 
     def get_always_apply(self, transforms):
-        new_transforms = []
-        for transform in transforms:
-            if isinstance(transform, BaseCompose):
-                new_transforms.extend(self.get_always_apply(transform))
-            elif transform.always_apply:
-                new_transforms.append(transform)
-        return Transforms(new_transforms)
+        return Transforms(transform_always_apply(transforms))
 
     def __getitem__(self, item):
         return self.transforms[item]
 
 
+class TransformsPlan:
+    """Transforms nested in Compose flattened into arrays.
+
+    Apply/skip decisions of all transforms are drawn in one vectorized call and
+    only transforms that run are visited. OneOf and OneOrOther are kept as
+    single nodes that make their own choice. ``p`` and ``always_apply`` are
+    read from the transforms on every draw, so they can be changed after the
+    pipeline is built, e.g. by a probability schedule.
+    """
+
+    def __init__(self, transforms):
+        self.nodes = []
+        parents = []
+        selects = []
+        is_leaf = []
+        depths = []
+        stack = [(t, -1, 1) for t in reversed(list(transforms))]
+        while stack:
+            transform, parent, depth = stack.pop()
+            idx = len(self.nodes)
+            self.nodes.append(transform)
+            parents.append(parent)
+            depths.append(depth)
+            # p of OneOrOther selects a transform, one of them always runs
+            selects.append(isinstance(transform, OneOrOther))
+            nested = isinstance(transform, Compose) and not isinstance(
+                transform, (ReplayCompose, SequenceCompose, TTACompose)
+            )
+            is_leaf.append(not nested)
+            if nested:
+                children = list(transform.transforms.transforms)
+                if transform.track_index:
+                    # the nested Compose is not called, so a node adds its index
+                    children.insert(0, IndexSeed())
+                stack.extend((t, idx, depth + 1) for t in reversed(children))
+        self.parents = np.array(parents, dtype=np.int64)
+        self.selects = np.array(selects, dtype=bool)
+        self.is_leaf = np.array(is_leaf, dtype=bool)
+        self.depth = max(depths, default=0)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def probabilities(self):
+        probabilities = np.fromiter(
+            (float(t.p) for t in self.nodes), dtype=float, count=len(self)
+        )
+        probabilities[self.selects] = 1.0
+        return probabilities
+
+    @property
+    def always_apply(self):
+        return np.fromiter(
+            (bool(getattr(t, "always_apply", False)) for t in self.nodes),
+            dtype=bool,
+            count=len(self),
+        )
+
+    def sample(self, batch_size=None):
+        shape = len(self) if batch_size is None else (batch_size, len(self))
+        return get_np_random().random(shape) < self.probabilities
+
+    def run(self, decisions, force_apply=False, **data):
+        active = np.ones(len(self) + 1, dtype=bool)
+        if not force_apply:
+            active[:-1] = decisions | self.always_apply
+        # the last element stands for the root, so it is the parent of -1
+        for _ in range(self.depth):
+            active[:-1] &= active[self.parents]
+        parent_active = active[self.parents]
+        active = active[:-1]
+        for idx in np.flatnonzero(self.is_leaf & (active | ~parent_active)):
+            if active[idx]:
+                data = self.nodes[idx](force_apply=True, **data)
+            else:
+                for t in transform_always_apply([self.nodes[idx]]):
+                    data = t(force_apply=force_apply, **data)
+        return data
+
+
+def write_out(data, out, pool):
+    """Copy results into ``out`` arrays and out of pooled buffers."""
+    for target, value in data.items():
+        if target in out:
+            buffer = out[target]
+            if not isinstance(value, np.ndarray) or not isinstance(buffer, np.ndarray):
+                raise ValueError(
+                    "Output array of {} requires an array result and an array "
+                    "buffer, got {} and {}".format(
+                        target, type(value).__name__, type(buffer).__name__
+                    )
+                )
+            if len(buffer) < len(value) or buffer.shape[1:] != value.shape[1:]:
+                raise ValueError(
+                    "Output array of {} has shape {}, but the result has shape "
+                    "{}".format(target, buffer.shape, value.shape)
+                )
+            data[target] = buffer[: len(value)]
+            np.copyto(data[target], value)
+        elif isinstance(value, np.ndarray) and pool.owns(value):
+            data[target] = value.copy()
+    return data
+
+
+def transform_always_apply(transforms):
+    always_apply = []
+    for transform in transforms:
+        if isinstance(transform, BaseCompose):
+            if getattr(transform, "track_index", False):
+                always_apply.append(IndexSeed())
+            always_apply.extend(transform_always_apply(transform))
+        elif transform.always_apply:
+            always_apply.append(transform)
+    return always_apply
+
+
+def point_index(n_points):
+    dtype = np.int32 if n_points <= np.iinfo(np.int32).max else np.int64
+    return np.arange(n_points, dtype=dtype)
+
+
+def seed_index(data):
+    if data.get("index") is None:
+        data["index"] = point_index(len(data.get("points", data.get("cloud"))))
+    return data
+
+
+class IndexSeed:
+    """Add the ``index`` target for a flattened Compose with ``track_index``."""
+
+    p = 1.0
+    always_apply = True
+
+    def __call__(self, force_apply=False, **data):
+        return seed_index(data)
+
+
+def subsample_first(transforms):
+    """Move uniform subsampling transforms in front of preceding pointwise ones.
+
+    Pointwise transforms then only process points that are kept. The result
+    has the same distribution as the original order, though for a fixed seed
+    random numbers are drawn in a different order.
+    """
+    transforms = list(transforms)
+    for idx, transform in enumerate(transforms):
+        if not getattr(transform, "subsamples_uniformly", False):
+            continue
+        position = idx
+        while position > 0 and getattr(transforms[position - 1], "pointwise", False):
+            position -= 1
+        transforms.insert(position, transforms.pop(idx))
+    return transforms
+
+
+def alias_table(probabilities):
+    """Build Vose's alias table to sample from a discrete distribution in O(1).
+
+    Returns:
+        prob (list): probability to keep the uniformly drawn index.
+        alias (list): index to take instead of the drawn one.
+    """
+    n = len(probabilities)
+    total = sum(probabilities)
+    scaled = [p * n / total for p in probabilities]
+    prob = [1.0] * n
+    alias = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1]
+    large = [i for i, p in enumerate(scaled) if p >= 1]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        prob[less] = scaled[less]
+        alias[less] = more
+        scaled[more] += scaled[less] - 1
+        (small if scaled[more] < 1 else large).append(more)
+    return prob, alias
+
+
 def set_always_apply(transforms):
     for t in transforms:
         t.always_apply = True
@@ -114,6 +295,10 @@ class BaseCompose:
             for t in self.transforms:
                 t.add_targets(additional_targets)
 
+    def set_layout(self, layout):
+        for t in self.transforms:
+            t.set_layout(layout)
+
     def set_deterministic(self, flag, save_key="replay"):
         for t in self.transforms:
             t.set_deterministic(flag, save_key)
@@ -127,6 +312,18 @@ class Compose(BaseCompose):
         additional_targets (dict): Dict with keys - new target name,
             values - old target name. ex: {'image2': 'image'}
         p (float): probability of applying all list of transforms. Default: 1.0.
+        reorder (bool): run uniform subsampling transforms (e.g. RandomDropout3d)
+            before preceding pointwise transforms (e.g. Scale3d), so they process
+            fewer points. Default: False.
+        track_index (bool): add ``index`` target with the input index of every
+            output point. Default: False.
+        layout (PointLayout or dict): columns of targets in the ``cloud``
+            target, an ``(N, C)`` array of all point attributes. Default: None.
+
+    Nested Compose pipelines are flattened once, so apply/skip decisions of all
+    transforms are drawn at once. To apply the pipeline to a batch with
+    decisions drawn in a single call, use ``draw_plan(batch_size)`` and pass
+    its rows to ``apply_plan``.
     """
 
     def __init__(
@@ -134,8 +331,16 @@ class Compose(BaseCompose):
         transforms,
         additional_targets=None,
         p=1.0,
+        reorder=False,
+        track_index=False,
+        layout=None,
     ):
-        super(Compose, self).__init__([t for t in transforms if t is not None], p)
+        transforms = [t for t in transforms if t is not None]
+        if reorder:
+            transforms = subsample_first(transforms)
+        super(Compose, self).__init__(transforms, p)
+        self.reorder = reorder
+        self.track_index = track_index
 
         self.processors = {}
 
@@ -149,10 +354,58 @@ class Compose(BaseCompose):
 
         self.add_targets(additional_targets)
 
-    def __call__(self, force_apply=False, **data):
-        need_to_run = force_apply or (random.random() < self.p)
+        if isinstance(layout, dict):
+            layout = PointLayout(**layout)
+        self.layout = layout
+        if layout is not None:
+            self.set_layout(layout)
+
+        self.plan = TransformsPlan(self.transforms)
+
+    def draw_plan(self, batch_size=None):
+        """Draw apply/skip decisions for all nested transforms.
+
+        Args:
+            batch_size (int): number of samples to draw decisions for.
+
+        Returns:
+            np.ndarray: boolean decisions, ``(T,)`` or ``(batch_size, T)``.
+        """
+        return self.plan.sample(batch_size)
+
+    def apply_plan(self, plan, force_apply=False, **data):
+        """Apply transforms selected by decisions from ``draw_plan``."""
+        return self.plan.run(plan, force_apply=force_apply, **data)
+
+    def __call__(self, force_apply=False, out=None, **data):
+        """Apply the pipeline.
+
+        Args:
+            force_apply (bool): apply the pipeline regardless of ``p``.
+            out (dict): target name to a preallocated array with at least as
+                many rows as the result. Results are written into its first
+                rows and returned as views. While the call runs, gathered
+                intermediates are taken from the BufferPool of the thread and
+                recycled by the next call. Default: None.
+        """
+        if out is None:
+            return self.apply_transforms(force_apply, **data)
+        pool = thread_pool()
+        pool.open()
+        try:
+            data = self.apply_transforms(force_apply, **data)
+            return write_out(data, out, pool)
+        finally:
+            pool.close()
+
+    def apply_transforms(self, force_apply=False, **data):
+        need_to_run = force_apply or (get_random().random() < self.p)
         for p in self.processors.values():
             p.ensure_data_valid(data)
+        if self.track_index:
+            seed_index(data)
+        if need_to_run and not self.processors:
+            return self.apply_plan(self.draw_plan(), force_apply=force_apply, **data)
         transforms = (
             self.transforms
             if need_to_run
@@ -175,7 +428,14 @@ class Compose(BaseCompose):
 
     def _to_dict(self):
         dictionary = super(Compose, self)._to_dict()
-        dictionary.update({"additional_targets": self.additional_targets})
+        dictionary.update(
+            {
+                "additional_targets": self.additional_targets,
+                "reorder": self.reorder,
+                "track_index": self.track_index,
+                "layout": None if self.layout is None else self.layout.to_dict(),
+            }
+        )
         return dictionary
 
 
@@ -192,6 +452,7 @@ class OneOf(BaseCompose):
         transforms_ps = [t.p for t in transforms]
         s = sum(transforms_ps)
         self.transforms_ps = [t / s for t in transforms_ps]
+        self.cumulative_ps = list(itertools.accumulate(self.transforms_ps))
 
     def __call__(self, force_apply=False, **data):
         if self.replay_mode:
@@ -199,13 +460,126 @@ class OneOf(BaseCompose):
                 data = t(**data)
             return data
 
-        if self.transforms_ps and (force_apply or random.random() < self.p):
-            random_state = np.random.RandomState(random.randint(0, 2**32 - 1))
-            t = random_state.choice(self.transforms.transforms, p=self.transforms_ps)
+        if self.transforms_ps and (force_apply or get_random().random() < self.p):
+            idx = bisect.bisect(self.cumulative_ps, get_random().random())
+            t = self.transforms[min(idx, len(self.transforms_ps) - 1)]
             data = t(force_apply=True, **data)
         return data
 
 
+class SomeOf(BaseCompose):
+    """Select n of transforms to apply.
+
+    Transforms are selected with probabilities proportional to their ``p`` and
+    applied in the order they are listed.
+
+    Args:
+        transforms (list): list of transformations to compose.
+        n (int): number of transforms to apply.
+        replace (bool): whether a transform can be selected more than once.
+            Such SomeOf cannot be used in ReplayCompose. Default: False.
+        p (float): probability of applying selected transforms. Default: 1.0.
+    """
+
+    def __init__(self, transforms, n=1, replace=False, p=1.0):
+        super(SomeOf, self).__init__(transforms, p)
+        self.n = n
+        self.replace = replace
+        transforms_ps = [t.p for t in transforms]
+        self.uniform = len(set(transforms_ps)) <= 1
+        if replace and transforms_ps:
+            self.alias_prob, self.alias = alias_table(transforms_ps)
+        # Efraimidis-Spirakis keys u ** (1 / p) select without replacement
+        self.inverse_ps = np.array(
+            [1 / t if t > 0 else np.inf for t in transforms_ps], dtype=float
+        )
+
+    def select(self):
+        n_transforms = len(self.inverse_ps)
+        if not n_transforms:
+            return []
+        rng = get_random()
+        if self.replace:
+            selected = []
+            for _ in range(self.n):
+                idx = int(rng.random() * n_transforms)
+                if rng.random() >= self.alias_prob[idx]:
+                    idx = self.alias[idx]
+                selected.append(idx)
+            return sorted(selected)
+        n = min(self.n, n_transforms)
+        if self.uniform:
+            return sorted(rng.sample(range(n_transforms), n))
+        keys = get_np_random().random(n_transforms) ** self.inverse_ps
+        # n largest keys in linear time, without sorting all of them
+        return sorted(np.argpartition(-keys, n - 1)[:n].tolist())
+
+    def __call__(self, force_apply=False, **data):
+        if self.replay_mode:
+            for t in self.transforms:
+                data = t(**data)
+            return data
+
+        if force_apply or get_random().random() < self.p:
+            for idx in self.select():
+                data = self.transforms[idx](force_apply=True, **data)
+        return data
+
+    def set_deterministic(self, flag, save_key="replay"):
+        if flag and self.replace:
+            raise ValueError(
+                "SomeOf with replace=True cannot be replayed: params of a "
+                "transform selected more than once are saved only once"
+            )
+        super(SomeOf, self).set_deterministic(flag, save_key)
+
+    def _to_dict(self):
+        dictionary = super(SomeOf, self)._to_dict()
+        dictionary.update({"n": self.n, "replace": self.replace})
+        return dictionary
+
+
+class RandomOrder(BaseCompose):
+    """Apply transforms in random order.
+
+    Every transform is still applied with its own probability.
+
+    Args:
+        transforms (list): list of transformations to compose.
+        p (float): probability of applying all list of transforms. Default: 1.0.
+    """
+
+    def __init__(self, transforms, p=1.0):
+        super(RandomOrder, self).__init__(transforms, p)
+        self.deterministic = False
+        self.save_key = "replay"
+        self.params = None
+
+    def set_deterministic(self, flag, save_key="replay"):
+        super(RandomOrder, self).set_deterministic(flag, save_key)
+        self.deterministic = flag
+        self.save_key = save_key
+
+    def __call__(self, force_apply=False, **data):
+        if self.replay_mode:
+            order = self.params["order"] if self.params else None
+            for idx in order or range(len(self.transforms.transforms)):
+                data = self.transforms[idx](**data)
+            return data
+
+        if force_apply or get_random().random() < self.p:
+            # the order is local to the call, so the instance is not mutated
+            order = list(range(len(self.transforms.transforms)))
+            get_random().shuffle(order)
+            if self.deterministic:
+                data[self.save_key][id(self)] = {"order": order}
+            # forcing RandomOrder does not force its transforms, every one
+            # of them still runs with its own probability
+            for idx in order:
+                data = self.transforms[idx](force_apply=False, **data)
+        return data
+
+
 class OneOrOther(BaseCompose):
     def __init__(self, first=None, second=None, transforms=None, p=0.5):
         if transforms is None:
@@ -218,7 +592,7 @@ class OneOrOther(BaseCompose):
                 data = t(**data)
             return data
 
-        if random.random() < self.p:
+        if get_random().random() < self.p:
             return self.transforms[0](force_apply=True, **data)
 
         return self.transforms[-1](force_apply=True, **data)
@@ -231,8 +605,18 @@ class ReplayCompose(Compose):
         additional_targets=None,
         p=1.0,
         save_key="replay",
+        reorder=False,
+        track_index=False,
+        layout=None,
     ):
-        super(ReplayCompose, self).__init__(transforms, additional_targets, p)
+        super(ReplayCompose, self).__init__(
+            transforms,
+            additional_targets,
+            p,
+            reorder=reorder,
+            track_index=track_index,
+            layout=layout,
+        )
         self.set_deterministic(True, save_key=save_key)
         self.save_key = save_key
 
@@ -298,3 +682,257 @@ class ReplayCompose(Compose):
 
     def _to_dict(self):
         raise NotImplementedError("You cannot serialize ReplayCompose")
+
+
+class SequenceCompose(Compose):
+    """Apply the same transforms to all frames of a sequence.
+
+    Frames are packed into one array per target and the pipeline runs once on
+    the packed arrays, so params are drawn once and every transform makes a
+    single vectorized pass over all frames. Params that depend on points,
+    e.g. the rotation center, are computed over all frames.
+
+    Targets are passed as lists with an array per frame, or as packed arrays
+    of all frames with ``offsets``. Results have the same form with points
+    grouped by frame and carry under ``save_key``:
+
+    * ``offsets`` - ``(F + 1,)`` start rows of frames in packed results,
+    * ``index`` - index of the input point of every output point in its frame,
+    * ``affines`` - ``(F, 4, 4)`` matrices mapping input coordinates of every
+      frame to output coordinates, its ego pose included, None if a transform
+      that is not affine ran.
+
+    Args:
+        transforms (list): list of transformations to compose.
+        additional_targets (dict): Dict with keys - new target name,
+            values - old target name. ex: {'points2': 'points'}
+        p (float): probability of applying all list of transforms. Default: 1.0.
+        layout (PointLayout or dict): columns of targets in the ``cloud``
+            target. Default: None.
+        save_key (str): key to store frame data. Default: "sequence".
+    """
+
+    def __init__(
+        self,
+        transforms,
+        additional_targets=None,
+        p=1.0,
+        layout=None,
+        save_key="sequence",
+    ):
+        super(SequenceCompose, self).__init__(
+            transforms, additional_targets, p, layout=layout
+        )
+        self.save_key = save_key
+
+    def __call__(self, force_apply=False, poses=None, offsets=None, **data):
+        """Apply the pipeline to all frames.
+
+        Args:
+            force_apply (bool): apply the pipeline regardless of ``p``.
+            poses (np.ndarray): ``(F, 4, 4)`` ego poses mapping coordinates of
+                every frame to a common coordinate frame. They are applied to
+                points and normals before the transforms. Default: None.
+            offsets (list): start rows of frames in packed targets followed by
+                the number of rows. Required if targets are packed.
+        """
+        packed = offsets is not None
+        if packed:
+            offsets = np.asarray(offsets, dtype=np.int64)
+            n_rows = int(offsets[-1])
+            per_point = [
+                key
+                for key, value in data.items()
+                if isinstance(value, np.ndarray) and value.ndim and len(value) == n_rows
+            ]
+        else:
+            frames = data.get("points", data.get("cloud"))
+            offsets = np.cumsum([0] + [len(frame) for frame in frames])
+            per_point = [
+                key
+                for key, value in data.items()
+                if isinstance(value, (list, tuple)) and len(value) == len(frames)
+            ]
+            for key in per_point:
+                data[key] = np.concatenate(data[key])
+        n_frames = len(offsets) - 1
+        if poses is not None:
+            poses = np.asarray(poses, dtype=np.float64)
+            apply_poses(self.target_views(data), offsets, poses)
+
+        data["index"] = point_index(int(offsets[-1]))
+        data["affine"] = np.eye(4)
+        data = super(SequenceCompose, self).__call__(force_apply=force_apply, **data)
+        index = data.pop("index")
+        affine = data.pop("affine")
+
+        frame = np.searchsorted(offsets, index, side="right") - 1
+        if np.any(frame[1:] < frame[:-1]):
+            order = np.argsort(frame, kind="stable")
+            frame = frame[order]
+            index = index[order]
+            for key in per_point:
+                data[key] = data[key][order]
+        counts = np.bincount(frame, minlength=n_frames)
+        new_offsets = np.cumsum(np.concatenate([[0], counts]))
+        index = index - offsets[frame]
+        if not packed:
+            for key in per_point:
+                data[key] = np.split(data[key], new_offsets[1:-1])
+            index = np.split(index, new_offsets[1:-1])
+        if affine is not None:
+            affine = np.repeat(affine[np.newaxis], n_frames, axis=0)
+            if poses is not None:
+                affine = affine @ poses
+        data[self.save_key] = {
+            "offsets": new_offsets,
+            "index": index,
+            "affines": affine,
+        }
+        return data
+
+    def target_views(self, data):
+        if self.layout is not None and data.get("cloud") is not None:
+            return self.layout.views(data["cloud"])
+        return data
+
+    def _to_dict(self):
+        dictionary = super(SequenceCompose, self)._to_dict()
+        del dictionary["reorder"]
+        del dictionary["track_index"]
+        dictionary["save_key"] = self.save_key
+        return dictionary
+
+
+def apply_poses(targets, offsets, poses):
+    """Map points and normals of every frame with its ``(4, 4)`` pose in place."""
+    points = targets.get("points")
+    normals = targets.get("normals")
+    for pose, start, stop in zip(poses, offsets[:-1], offsets[1:]):
+        rotation = pose[:3, :3]
+        if points is not None:
+            coordinates = points[start:stop, :3]
+            coordinates[...] = coordinates @ rotation.T + pose[:3, 3]
+        if normals is not None:
+            vectors = normals[start:stop, :3]
+            vectors[...] = vectors @ rotation.T
+
+
+class TTACompose(Compose):
+    """Produce deterministic augmented variants for test-time augmentation.
+
+    Variant ``k`` is produced with random generators seeded with ``seed + k``,
+    so the same input always gets the same variants. Every variant carries
+    what is needed to map predictions back to the input points under
+    ``save_key``:
+
+    * ``indexes`` - index of the input point of every output point,
+    * ``affine`` - ``(4, 4)`` matrix mapping input to output coordinates,
+      composed from params of applied transforms, None if a transform that
+      is not affine ran (e.g. Jitter3d),
+    * ``inverse_affine`` - its inverse, None with ``affine``.
+
+    Args:
+        transforms (list): list of transformations to compose.
+        n_variants (int): number of variants to produce. Default: 4.
+        seed (int): seed of the first variant. Default: 0.
+        additional_targets (dict): Dict with keys - new target name,
+            values - old target name. ex: {'points2': 'points'}
+        p (float): probability of applying all list of transforms. Default: 1.0.
+        save_key (str): key to store inverse transform data. Default: "tta".
+    """
+
+    def __init__(
+        self,
+        transforms,
+        n_variants=4,
+        seed=0,
+        additional_targets=None,
+        p=1.0,
+        save_key="tta",
+    ):
+        super(TTACompose, self).__init__(
+            transforms, additional_targets, p, track_index=True
+        )
+        self.n_variants = n_variants
+        self.seed = seed
+        self.save_key = save_key
+
+    def __call__(self, force_apply=False, **data):
+        points = data["points"]
+        variants = []
+        random_state = random_utils.get_state()
+        try:
+            for k in range(self.n_variants):
+                random_utils.seed(self.seed + k)
+                variant = {
+                    key: value.copy() if isinstance(value, np.ndarray) else value
+                    for key, value in data.items()
+                }
+                variant["index"] = point_index(len(points))
+                variant["affine"] = np.eye(4)
+                variant = super(TTACompose, self).__call__(
+                    force_apply=force_apply, **variant
+                )
+                indexes = variant.pop("index")
+                affine = variant.pop("affine")
+                variant[self.save_key] = {
+                    "indexes": indexes,
+                    "affine": affine,
+                    "inverse_affine": None if affine is None else np.linalg.inv(affine),
+                }
+                variants.append(variant)
+        finally:
+            random_utils.set_state(random_state)
+        return variants
+
+    def merge(self, predictions, variants, n_points):
+        """Average per point predictions of all variants on the input points.
+
+        Args:
+            predictions (list): ``(M_k, ...)`` prediction for every variant.
+            variants (list): variants returned by the call.
+            n_points (int): number of input points.
+
+        Returns:
+            merged (np.ndarray): ``(n_points, ...)`` averaged predictions,
+                NaN for points that are missing in all variants.
+            counts (np.ndarray): number of variants every point is present in.
+        """
+        if len(predictions) == 0:
+            raise ValueError("merge requires predictions of at least one variant")
+        if len(predictions) != len(variants):
+            raise ValueError(
+                "Got {} predictions for {} variants".format(
+                    len(predictions), len(variants)
+                )
+            )
+        sums = None
+        counts = np.zeros(n_points, dtype=np.int64)
+        for prediction, variant in zip(predictions, variants):
+            prediction = np.asarray(prediction)
+            if sums is None:
+                sums = np.zeros((n_points,) + prediction.shape[1:])
+            indexes = variant[self.save_key]["indexes"]
+            np.add.at(sums, indexes, prediction)
+            counts += np.bincount(indexes, minlength=n_points)
+        shape = (n_points,) + (1,) * (sums.ndim - 1)
+        merged = np.full_like(sums, np.nan)
+        np.divide(
+            sums, counts.reshape(shape), out=merged, where=counts.reshape(shape) > 0
+        )
+        return merged, counts
+
+    def _to_dict(self):
+        dictionary = super(TTACompose, self)._to_dict()
+        del dictionary["reorder"]
+        del dictionary["track_index"]
+        del dictionary["layout"]
+        dictionary.update(
+            {
+                "n_variants": self.n_variants,
+                "seed": self.seed,
+                "save_key": self.save_key,
+            }
+        )
+        return dictionary
@@ -0,0 +1,85 @@
+"""Layout of targets stored as columns of one array."""
+
+import numpy as np
+
+__all__ = ["PointLayout"]
+
+
+class PointLayout:
+    """Named column slices of one ``(N, C)`` array passed as the ``cloud`` target.
+
+    With a layout, transforms that select a subset of points gather rows of
+    the whole array at once instead of every target separately, and other
+    transforms work on column views of targets.
+
+    Args:
+        **columns: target name to its columns: a slice, ``(start, stop)`` pair
+            or an int for a single column that is viewed as a 1-d array,
+            ex: ``PointLayout(points=(0, 3), normals=(3, 6), labels=6)``.
+    """
+
+    def __init__(self, **columns):
+        self.columns = {}
+        for target, index in columns.items():
+            if isinstance(index, (list, tuple)):
+                index = slice(*index)
+            elif not isinstance(index, (int, slice)):
+                raise ValueError(
+                    "Columns of {} must be a slice, (start, stop) pair or int, "
+                    "got {}".format(target, index)
+                )
+            self.columns[target] = index
+
+    def __repr__(self):
+        return "PointLayout({})".format(
+            ", ".join("{}={}".format(k, v) for k, v in self.to_dict().items())
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, PointLayout) and self.columns == other.columns
+
+    def to_dict(self):
+        return {
+            target: index if isinstance(index, int) else [index.start, index.stop]
+            for target, index in self.columns.items()
+        }
+
+    def views(self, cloud):
+        """Views of targets into columns of ``cloud``."""
+        return {target: cloud[:, index] for target, index in self.columns.items()}
+
+    def covers(self, n_columns):
+        """Whether every one of ``n_columns`` columns belongs to a target."""
+        covered = set()
+        for index in self.columns.values():
+            if isinstance(index, int):
+                covered.add(index)
+            else:
+                covered.update(range(*index.indices(n_columns)))
+        return covered == set(range(n_columns))
+
+    def stacked(self, cloud, *targets):
+        """View ``(N, 3)`` targets that are next to each other as ``(N, K, 3)``.
+
+        Returns:
+            np.ndarray or None: the view, None if targets are not adjacent
+            triples of columns.
+        """
+        if any(t not in self.columns for t in targets):
+            return None
+        ranges = [self.columns[t] for t in targets]
+        if any(isinstance(r, int) for r in ranges):
+            return None
+        ranges = [r.indices(cloud.shape[1]) for r in ranges]
+        if any(step != 1 or stop - start != 3 for start, stop, step in ranges):
+            return None
+        if any(a[1] != b[0] for a, b in zip(ranges, ranges[1:])):
+            return None
+        start = ranges[0][0]
+        stacked = cloud[:, start : start + 3 * len(targets)].reshape(
+            len(cloud), len(targets), 3
+        )
+        # reshape copies columns it cannot view, writes to a copy would be lost
+        if not np.may_share_memory(stacked, cloud):
+            return None
+        return stacked
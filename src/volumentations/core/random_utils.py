@@ -0,0 +1,62 @@
+"""Random number streams of threads.
+
+Transforms draw random numbers from streams of the calling thread, so one
+pipeline can be called from several threads at once and every thread can be
+seeded independently. The main thread uses the global ``random`` and
+``np.random`` streams, so ``random.seed`` and ``np.random.seed`` keep working.
+Other threads get their own streams seeded from OS entropy.
+"""
+
+import random
+import threading
+
+import numpy as np
+
+__all__ = ["get_random", "get_np_random", "seed", "get_state", "set_state"]
+
+
+_streams = threading.local()
+
+
+def init_streams():
+    if threading.current_thread() is threading.main_thread():
+        _streams.random = random
+        _streams.np_random = np.random
+    else:
+        _streams.random = random.Random()
+        _streams.np_random = np.random.RandomState()
+
+
+def get_random():
+    """Python random stream of the current thread, ``random.Random`` API."""
+    try:
+        return _streams.random
+    except AttributeError:
+        init_streams()
+        return _streams.random
+
+
+def get_np_random():
+    """Numpy random stream of the current thread, ``np.random.RandomState`` API."""
+    try:
+        return _streams.np_random
+    except AttributeError:
+        init_streams()
+        return _streams.np_random
+
+
+def seed(value):
+    """Seed random streams of the current thread."""
+    get_random().seed(value)
+    get_np_random().seed(value % 2**32)
+
+
+def get_state():
+    """State of random streams of the current thread."""
+    return get_random().getstate(), get_np_random().get_state()
+
+
+def set_state(state):
+    """Restore state returned by ``get_state``."""
+    get_random().setstate(state[0])
+    get_np_random().set_state(state[1])
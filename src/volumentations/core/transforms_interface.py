@@ -1,10 +1,11 @@
-import random
 from copy import deepcopy
 from warnings import warn
 
+import numpy as np
+from volumentations.core.random_utils import get_random
 from volumentations.core.serialization import SerializableMeta
 from volumentations.core.six import add_metaclass
-from volumentations.core.utils import format_args
+from volumentations.core.utils import format_args, remap_faces
 
 __all__ = [
     "to_tuple",
@@ -49,11 +50,20 @@ def to_tuple(param, low=None, bias=None):
 @add_metaclass(SerializableMeta)
 class BasicTransform:
     call_backup = None
+    # every point is transformed independently of the other points, so the
+    # transform commutes with taking a subset of points
+    pointwise = False
+    # keeps a random subset of points chosen independently of their values
+    subsamples_uniformly = False
+    # output points are input points selected by apply_to_index, so all
+    # columns of the cloud target are gathered at once
+    subsets = False
 
     def __init__(self, always_apply=False, p=0.5):
         self.p = p
         self.always_apply = always_apply
         self._additional_targets = {}
+        self.layout = None
 
         # replay mode params
         self.deterministic = False
@@ -69,16 +79,19 @@ class BasicTransform:
 
             return kwargs
 
-        if (random.random() < self.p) or self.always_apply or force_apply:
+        if (get_random().random() < self.p) or self.always_apply or force_apply:
             params = self.get_params()
 
             if self.targets_as_params:
+                available = kwargs
+                if self.layout is not None and "cloud" in kwargs:
+                    available = dict(self.layout.views(kwargs["cloud"]), **kwargs)
                 assert all(
-                    key in kwargs for key in self.targets_as_params
+                    key in available for key in self.targets_as_params
                 ), "{} requires {}".format(
                     self.__class__.__name__, self.targets_as_params
                 )
-                targets_as_params = {k: kwargs[k] for k in self.targets_as_params}
+                targets_as_params = {k: available[k] for k in self.targets_as_params}
                 params_dependent_on_targets = self.get_params_dependent_on_targets(
                     targets_as_params
                 )
@@ -101,16 +114,18 @@ class BasicTransform:
         if params is None:
             return kwargs
         params = self.update_params(params, **kwargs)
-        res = {}
-        for key, arg in kwargs.items():
+        dependence = self.target_dependence
+        res = dict.fromkeys(kwargs)
+        # targets that depend on other targets go first, so they see the
+        # inputs before other targets are transformed in place
+        for key in sorted(kwargs, key=lambda k: k not in dependence):
+            arg = kwargs[key]
             if arg is not None:
                 target_function = self._get_target_function(key)
                 target_dependencies = {
-                    k: kwargs[k] for k in self.target_dependence.get(key, [])
+                    k: kwargs[k] for k in dependence.get(key, []) if k in kwargs
                 }
                 res[key] = target_function(arg, **dict(params, **target_dependencies))
-            else:
-                res[key] = None
         return res
 
     def set_deterministic(self, flag, save_key="replay"):
@@ -164,6 +179,14 @@ class BasicTransform:
         """
         self._additional_targets = additional_targets
 
+    def set_layout(self, layout):
+        """Set PointLayout of columns of the ``cloud`` target.
+
+        Args:
+            layout (PointLayout): target name to its columns.
+        """
+        self.layout = layout
+
     @property
     def targets_as_params(self):
         return []
@@ -214,8 +237,16 @@ class PointCloudsTransform(BasicTransform):
             "cameras": self.apply_to_camera,
             "bbox": self.apply_to_bboxes,
             "labels": self.apply_to_labels,
+            "index": self.apply_to_index,
+            "cloud": self.apply_to_cloud,
+            "affine": self.apply_to_affine,
+            "faces": self.apply_to_faces,
         }
 
+    @property
+    def target_dependence(self):
+        return {"affine": ["points", "cloud"], "faces": ["points", "cloud"]}
+
     def apply_to_bboxes(self, bboxes, **params):
         return [self.apply_to_bbox(bbox, **params) for bbox in bboxes]
 
@@ -252,10 +283,101 @@ class PointCloudsTransform(BasicTransform):
             + self.__class__.__name__
         )
 
+    def apply_to_index(self, index, **params):
+        # only transforms that select a subset of points change the index
+        return index
+
+    def apply_to_faces(self, faces, points=None, cloud=None, **params):
+        """Update ``(F, 3)`` vertex indexes of mesh faces.
+
+        Transforms that keep a subset of points drop faces with removed
+        vertices and renumber the others with a lookup table from input to
+        output vertices. Reflections reverse the winding order of faces.
+        """
+        vertices = points if points is not None else cloud
+        if self.subsets:
+            if vertices is None:
+                raise ValueError(
+                    "Target faces requires points or cloud target in {}".format(
+                        self.__class__.__name__
+                    )
+                )
+            kept = self.apply_to_index(np.arange(len(vertices)), **params)
+            if isinstance(kept, list):
+                return [remap_faces(faces, k, len(vertices)) for k in kept]
+            return remap_faces(faces, kept, len(vertices))
+        if points is None and cloud is not None and self.layout is not None:
+            points = self.layout.views(cloud).get("points")
+        affine = self.get_affine(points, **params)
+        if affine is not None and np.linalg.det(affine[:3, :3]) < 0:
+            return faces[:, ::-1]
+        return faces
+
+    def get_affine(self, points, **params):
+        """``(4, 4)`` matrix that maps input to output coordinates of points.
+
+        Args:
+            points (np.ndarray): input points, None if they are not passed.
+
+        Returns:
+            np.ndarray or None: the matrix, None if the transform is not affine.
+        """
+        if self.subsets:
+            return np.eye(4)
+        return None
+
+    def apply_to_affine(self, affine, points=None, cloud=None, **params):
+        """Compose ``affine`` of preceding transforms with the one of this transform.
+
+        The ``affine`` target becomes None once a transform that is not
+        affine runs.
+        """
+        if points is None and cloud is not None and self.layout is not None:
+            points = self.layout.views(cloud).get("points")
+        transform_affine = self.get_affine(points, **params)
+        if transform_affine is None:
+            return None
+        return transform_affine @ affine
+
+    def apply_to_cloud(self, cloud, **params):
+        """Transform ``(N, C)`` array with columns of targets given by the layout.
+
+        Subsets are gathered with one ``apply_to_index`` call, other transforms
+        are applied to column views of targets and results are written back.
+        """
+        if self.layout is None:
+            raise ValueError(
+                "Target cloud requires a PointLayout, pass it to Compose or set_layout"
+            )
+        if self.subsets:
+            return self.apply_to_index(cloud, **params)
+        views = self.layout.views(cloud)
+        results = {
+            target: self.targets[target](view, **params)
+            for target, view in views.items()
+        }
+        if all(len(result) == len(cloud) for result in results.values()):
+            for target, result in results.items():
+                if result is not views[target]:
+                    views[target][...] = result
+            return cloud
+        if not self.layout.covers(cloud.shape[1]):
+            raise ValueError(
+                "{} changes the number of points, so the layout must cover all "
+                "columns of the cloud".format(self.__class__.__name__)
+            )
+        n_points = len(next(iter(results.values())))
+        out = np.empty((n_points, cloud.shape[1]), dtype=cloud.dtype)
+        for target, view in self.layout.views(out).items():
+            view[...] = results[target]
+        return out
+
 
 class NoOp(PointCloudsTransform):
     """Does nothing"""
 
+    pointwise = True
+
     def apply(self, points, **params):
         return points
 
@@ -274,5 +396,8 @@ class NoOp(PointCloudsTransform):
     def apply_to_labels(self, labels, **params):
         return labels
 
+    def get_affine(self, points, **params):
+        return np.eye(4)
+
     def get_transform_init_args_names(self):
         return ()
@@ -1,7 +1,10 @@
 """Utils used by volumentations."""
 
+import threading
 from abc import ABCMeta, abstractmethod
 
+import numpy as np
+
 from ..core.six import add_metaclass, string_types
 
 
@@ -12,3 +15,117 @@ def format_args(args_dict):
             v = "'{}'".format(v)
         formatted_args.append("{}={}".format(k, v))
     return ", ".join(formatted_args)
+
+
+_buffers = threading.local()
+
+
+def thread_buffer(name, size, dtype):
+    """Get 1-d scratch array of ``size`` elements owned by the calling thread.
+
+    The array is a view of a buffer that grows to the largest requested size
+    and is returned again by the next call with the same name in the thread,
+    so its content must be used before that.
+    """
+    buffer = getattr(_buffers, name, None)
+    if buffer is None or buffer.size < size or buffer.dtype != dtype:
+        current = 0 if buffer is None else buffer.size
+        buffer = np.empty(max(size, 2 * current), dtype=dtype)
+        setattr(_buffers, name, buffer)
+    return buffer[:size]
+
+
+class BufferPool:
+    """Size-classed pool of buffers for intermediate arrays.
+
+    Buffers are recycled only while a session is open: arrays handed out in
+    a session are returned to the pool when the outermost session ends, so
+    steady state pipelines stop allocating once the pool is warm. Outside of
+    a session ``empty`` allocates a new array.
+    """
+
+    # smallest size class in bytes
+    MIN_SIZE = 4096
+
+    def __init__(self):
+        self.free = {}
+        self.in_use = {}
+        self.depth = 0
+
+    @property
+    def active(self):
+        return self.depth > 0
+
+    def size_class(self, n_bytes):
+        return max(self.MIN_SIZE, 1 << (max(n_bytes, 1) - 1).bit_length())
+
+    def empty(self, shape, dtype):
+        """Uninitialized array of ``shape`` and ``dtype``."""
+        if not self.active:
+            return np.empty(shape, dtype=dtype)
+        dtype = np.dtype(dtype)
+        n_bytes = int(np.prod(shape)) * dtype.itemsize
+        size = self.size_class(n_bytes)
+        free = self.free.get(size)
+        buffer = free.pop() if free else np.empty(size, dtype=np.uint8)
+        self.in_use[id(buffer)] = buffer
+        return buffer[:n_bytes].view(dtype).reshape(shape)
+
+    def owns(self, array):
+        """Whether ``array`` is a view of a buffer handed out in the session."""
+        while isinstance(array, np.ndarray) and array.base is not None:
+            array = array.base
+        return id(array) in self.in_use
+
+    def open(self):
+        self.depth += 1
+
+    def close(self):
+        self.depth -= 1
+        if self.depth == 0:
+            for buffer in self.in_use.values():
+                self.free.setdefault(buffer.size, []).append(buffer)
+            self.in_use.clear()
+
+
+_pools = threading.local()
+
+
+def thread_pool():
+    """BufferPool of the calling thread."""
+    pool = getattr(_pools, "pool", None)
+    if pool is None:
+        pool = _pools.pool = BufferPool()
+    return pool
+
+
+def remap_faces(faces, indexes, n_vertices):
+    """Keep faces with all vertices in ``indexes`` and renumber their vertices.
+
+    Args:
+        faces (np.ndarray): ``(F, 3)`` vertex indexes of faces.
+        indexes (np.ndarray): input vertex of every output vertex, boolean mask
+            or integer indexes.
+        n_vertices (int): number of input vertices.
+
+    Returns:
+        np.ndarray: faces with indexes of output vertices.
+    """
+    if indexes.dtype == bool:
+        indexes = np.flatnonzero(indexes)
+    lookup = np.full(n_vertices, -1, dtype=np.int64)
+    lookup[indexes] = np.arange(len(indexes))
+    remapped = lookup[faces]
+    keep = (remapped >= 0).all(axis=1)
+    return remapped[keep].astype(faces.dtype, copy=False)
+
+
+def collapse_faces(faces, inverse):
+    """Renumber vertices of faces to their clusters and drop degenerate faces."""
+    collapsed = inverse[faces]
+    keep = (
+        (collapsed[:, 0] != collapsed[:, 1])
+        & (collapsed[:, 1] != collapsed[:, 2])
+        & (collapsed[:, 0] != collapsed[:, 2])
+    )
+    return collapsed[keep].astype(faces.dtype, copy=False)
@@ -0,0 +1,283 @@
+"""Point cloud readers that return targets as views into one memory map.
+
+Files are mapped copy-on-write, so transforms can change arrays in place
+without touching the file and only pages that are changed get copied.
+"""
+
+import os
+import struct
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+__all__ = [
+    "read",
+    "read_kitti_bin",
+    "read_ply",
+    "read_npy",
+    "read_npz",
+    "prefetch",
+]
+
+
+PLY_TYPES = {
+    "char": "i1",
+    "int8": "i1",
+    "uchar": "u1",
+    "uint8": "u1",
+    "short": "i2",
+    "int16": "i2",
+    "ushort": "u2",
+    "uint16": "u2",
+    "int": "i4",
+    "int32": "i4",
+    "uint": "u4",
+    "uint32": "u4",
+    "float": "f4",
+    "float32": "f4",
+    "double": "f8",
+    "float64": "f8",
+}
+
+PLY_TARGETS = {
+    "points": ("x", "y", "z"),
+    "normals": ("nx", "ny", "nz"),
+    "features": ("red", "green", "blue", "alpha", "intensity", "reflectance"),
+    "labels": ("label", "class", "semantic", "instance"),
+}
+
+
+def columns_view(array, offset, dtype, n_columns, stride):
+    """View ``n_columns`` values of ``dtype`` starting at byte ``offset`` of
+    every record of a 1-d array as a 2-d array without copying."""
+    return np.ndarray(
+        shape=(len(array), n_columns),
+        dtype=dtype,
+        buffer=array,
+        offset=offset,
+        strides=(stride, np.dtype(dtype).itemsize),
+    )
+
+
+def split_columns(array, columns):
+    """Split a 2-d array into targets.
+
+    Args:
+        array (np.ndarray): ``(N, C)`` array.
+        columns (dict): target name to slice of columns,
+            ex: {'points': slice(0, 3), 'features': slice(3, None)}.
+    """
+    return {target: array[:, index] for target, index in columns.items()}
+
+
+def read_kitti_bin(path, columns=None):
+    """Read KITTI velodyne scan of float32 x, y, z and reflectance.
+
+    Args:
+        path (str): path to the file.
+        columns (dict): target name to slice of columns. Default:
+            points are the first three columns, features the reflectance.
+    """
+    if columns is None:
+        columns = {"points": slice(0, 3), "features": slice(3, 4)}
+    scan = np.memmap(path, dtype=np.float32, mode="c").reshape(-1, 4)
+    return split_columns(scan, columns)
+
+
+def read_npy(path, columns=None):
+    """Read ``(N, C)`` array saved with ``np.save``.
+
+    Args:
+        path (str): path to the file.
+        columns (dict): target name to slice of columns. Default: all columns
+            are points.
+    """
+    if columns is None:
+        columns = {"points": slice(None)}
+    return split_columns(np.load(path, mmap_mode="c"), columns)
+
+
+def read_npz(path):
+    """Read arrays saved with ``np.savez``, array names are used as targets.
+
+    Arrays stored without compression are memory mapped, compressed arrays
+    are read into memory.
+    """
+    data = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[: -len(".npy")]
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    data[name] = np.lib.format.read_array(member)
+                continue
+            f.seek(info.header_offset)
+            header = f.read(30)
+            name_length, extra_length = struct.unpack("<HH", header[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            data[name] = np.memmap(
+                path,
+                dtype=dtype,
+                mode="c",
+                offset=f.tell(),
+                shape=shape,
+                order="F" if fortran_order else "C",
+            )
+    return data
+
+
+def read_ply_header(f):
+    """Parse header of a binary PLY file.
+
+    Returns:
+        elements (list): ``(name, count, properties)`` of every element.
+        byte_order (str): ``"<"`` or ``">"``.
+    """
+    if f.readline().strip() != b"ply":
+        raise ValueError("File is not a PLY file")
+    elements = []
+    byte_order = None
+    while True:
+        line = f.readline()
+        if not line:
+            raise ValueError("PLY header is not terminated with end_header")
+        words = line.decode("ascii").split()
+        if not words or words[0] in ("comment", "obj_info"):
+            continue
+        if words[0] == "end_header":
+            break
+        if words[0] == "format":
+            if words[1] == "ascii":
+                raise ValueError("Only binary PLY files are supported")
+            byte_order = "<" if words[1] == "binary_little_endian" else ">"
+        elif words[0] == "element":
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == "property":
+            elements[-1][2].append(words[1:])
+    return elements, byte_order
+
+
+def list_element_size(f, offset, count, properties, byte_order):
+    """Number of bytes of an element with list properties starting at ``offset``.
+
+    Rows have different sizes, so lengths of lists are read row by row.
+    """
+    f.seek(offset)
+    for _ in range(count):
+        for prop in properties:
+            if prop[0] == "list":
+                length_type = np.dtype(byte_order + PLY_TYPES[prop[1]])
+                length = np.frombuffer(f.read(length_type.itemsize), length_type)
+                if len(length) == 0:
+                    raise ValueError("PLY file ends inside an element")
+                f.seek(int(length[0]) * np.dtype(PLY_TYPES[prop[2]]).itemsize, 1)
+            else:
+                f.seek(np.dtype(PLY_TYPES[prop[0]]).itemsize, 1)
+    return f.tell() - offset
+
+
+def read_ply(path):
+    """Read vertices of a binary PLY file.
+
+    Vertex properties are mapped to targets by name, e.g. x, y, z to points
+    and red, green, blue to features. Groups of consecutive properties of the
+    same type are views into the memory map, other groups are copied.
+    """
+    with open(path, "rb") as f:
+        elements, byte_order = read_ply_header(f)
+        offset = f.tell()
+        for name, count, properties in elements:
+            if any(p[0] == "list" for p in properties):
+                if name == "vertex":
+                    raise ValueError("List properties of vertices are not supported")
+                offset += list_element_size(f, offset, count, properties, byte_order)
+                continue
+            dtype = np.dtype([(p[1], byte_order + PLY_TYPES[p[0]]) for p in properties])
+            if name == "vertex":
+                break
+            offset += count * dtype.itemsize
+        else:
+            raise ValueError("PLY file has no vertex element")
+    vertices = np.memmap(path, dtype=dtype, mode="c", offset=offset, shape=(count,))
+
+    data = {}
+    for target, names in PLY_TARGETS.items():
+        fields = [n for n in dtype.names if n in names]
+        if not fields:
+            continue
+        field_types = {dtype.fields[n][0] for n in fields}
+        offsets = [dtype.fields[n][1] for n in fields]
+        field_type = field_types.pop()
+        consecutive = all(
+            b - a == field_type.itemsize for a, b in zip(offsets, offsets[1:])
+        )
+        if not field_types and consecutive and field_type.isnative:
+            view = columns_view(
+                vertices, offsets[0], field_type, len(fields), dtype.itemsize
+            )
+        else:
+            view = np.stack([vertices[n] for n in fields], axis=1)
+        data[target] = view[:, 0] if target == "labels" and len(fields) == 1 else view
+    return data
+
+
+READERS = {
+    ".bin": read_kitti_bin,
+    ".ply": read_ply,
+    ".npy": read_npy,
+    ".npz": read_npz,
+}
+
+
+def read(path):
+    """Read point cloud with a reader selected by the file extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(
+            "Unknown file extension: {}. Supported extensions are: {}".format(
+                extension, ", ".join(READERS)
+            )
+        )
+    return READERS[extension](path)
+
+
+def read_ahead(path, reader):
+    if hasattr(os, "posix_fadvise"):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    return reader(path)
+
+
+def prefetch(paths, reader=read, workers=4, readahead=8):
+    """Read files in a thread pool ahead of consumption.
+
+    Args:
+        paths (list): paths of files to read.
+        reader (callable): function that reads a file. Default: read.
+        workers (int): number of threads. Default: 4.
+        readahead (int): number of files read ahead. Default: 8.
+
+    Yields:
+        dict: targets of every file in the order of ``paths``.
+    """
+    paths = iter(paths)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = [
+            executor.submit(read_ahead, path, reader)
+            for _, path in zip(range(readahead), paths)
+        ]
+        while pending:
+            future = pending.pop(0)
+            path = next(paths, None)
+            if path is not None:
+                pending.append(executor.submit(read_ahead, path, reader))
+            yield future.result()
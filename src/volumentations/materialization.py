@@ -0,0 +1,222 @@
+"""Offline augmentation written to memory-mapped shards."""
+
+import json
+import os
+import pickle  # skipcq: BAN-B403
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+
+import numpy as np
+
+from .core import random_utils
+from .core.composition import ReplayCompose
+from .core.serialization import to_dict
+
+__all__ = ["materialize", "MaterializedDataset"]
+
+
+MANIFEST_NAME = "manifest.json"
+
+
+def shard_name(shard):
+    return "shard-{:05d}".format(shard)
+
+
+def write_shard(pipeline, dataset, sources, k, out_dir, shard, seed):
+    """Augment ``sources`` samples ``k`` times and append targets to shard files.
+
+    Every target gets a row span for every sample, empty if the target is
+    missing from the sample.
+
+    Returns:
+        dict: shard description for the manifest.
+    """
+    name = shard_name(shard)
+    # ReplayCompose makes its transforms deterministic, so it wraps a copy
+    # and the caller's pipeline keeps working without a replay key
+    replay = ReplayCompose([deepcopy(pipeline)], save_key="replay")
+    files = {}
+    offsets = {}
+    targets = {}
+    replays = []
+    random_state = random_utils.get_state()
+    random_utils.seed(seed + shard)
+    try:
+        for source in sources:
+            sample = dataset[source]
+            for _ in range(k):
+                data = replay(**{t: np.array(v) for t, v in sample.items()})
+                replays.append(data.pop("replay"))
+                for target, value in data.items():
+                    if not isinstance(value, np.ndarray):
+                        continue
+                    value = np.ascontiguousarray(value)
+                    spec = {"dtype": value.dtype.str, "shape": list(value.shape[1:])}
+                    if target not in files:
+                        path = os.path.join(out_dir, "{}.{}.bin".format(name, target))
+                        files[target] = open(path, "wb")
+                        # earlier samples have no rows of the target
+                        offsets[target] = [0] * len(replays)
+                        targets[target] = spec
+                    elif targets[target] != spec:
+                        raise ValueError(
+                            "Target {} changed from {} to {}".format(
+                                target, targets[target], spec
+                            )
+                        )
+                    files[target].write(value.tobytes())
+                    offsets[target].append(offsets[target][-1] + len(value))
+                for target_offsets in offsets.values():
+                    if len(target_offsets) == len(replays):
+                        target_offsets.append(target_offsets[-1])
+    finally:
+        random_utils.set_state(random_state)
+        for f in files.values():
+            f.close()
+    for target, target_offsets in offsets.items():
+        np.save(
+            os.path.join(out_dir, "{}.{}.offsets.npy".format(name, target)),
+            np.array(target_offsets, dtype=np.int64),
+        )
+    with open(os.path.join(out_dir, name + ".replay.pkl"), "wb") as f:
+        pickle.dump(replays, f)
+    return {"name": name, "sources": list(sources), "targets": targets}
+
+
+def materialize(
+    pipeline,
+    dataset,
+    k,
+    out_dir,
+    workers=1,
+    samples_per_shard=256,
+    seed=0,
+):
+    """Write ``k`` augmented variants of every sample of a dataset to disk.
+
+    Shards are written by a process pool, every worker writes its own files:
+    a flat binary file per target, row offsets of samples in it and parameters
+    of applied transforms recorded with ReplayCompose. Read the result with
+    MaterializedDataset.
+
+    Args:
+        pipeline (Compose): augmentation pipeline.
+        dataset: sequence of dicts with targets, ex: {'points': np.ndarray}.
+            It is sent to worker processes, so it should be cheap to pickle,
+            e.g. load files in ``__getitem__``.
+        k (int): number of variants of every sample.
+        out_dir (str): directory to write shards and the manifest to.
+        workers (int): number of processes, 1 to work in this process.
+            Default: 1.
+        samples_per_shard (int): number of source samples in a shard.
+            Default: 256.
+        seed (int): seed of random generators, shard ``i`` uses ``seed + i``.
+            Default: 0.
+
+    Returns:
+        MaterializedDataset: the written dataset.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    chunks = [
+        range(start, min(start + samples_per_shard, len(dataset)))
+        for start in range(0, len(dataset), samples_per_shard)
+    ]
+    args = [
+        (pipeline, dataset, chunk, k, out_dir, shard, seed)
+        for shard, chunk in enumerate(chunks)
+    ]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            shards = list(executor.map(write_shard, *zip(*args)))
+    else:
+        shards = [write_shard(*a) for a in args]
+    manifest = {
+        "k": k,
+        "seed": seed,
+        "pipeline": to_dict(pipeline, on_not_implemented_error="warn"),
+        "shards": shards,
+    }
+    with open(os.path.join(out_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f)
+    return MaterializedDataset(out_dir)
+
+
+class MaterializedDataset:
+    """Augmented samples written by ``materialize``.
+
+    Samples are views into memory-mapped shard files. Variants of a source
+    sample are stored next to each other, sample ``i`` is variant
+    ``i % k`` of source sample ``i // k`` of its shard.
+
+    Args:
+        out_dir (str): directory with the manifest and shards.
+    """
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        with open(os.path.join(out_dir, MANIFEST_NAME)) as f:
+            self.manifest = json.load(f)
+        self.k = self.manifest["k"]
+        self.shards = self.manifest["shards"]
+        counts = [len(shard["sources"]) * self.k for shard in self.shards]
+        self.starts = np.cumsum([0] + counts)
+        self._arrays = {}
+        self._offsets = {}
+        self._replays = {}
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def locate(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("Sample index {} is out of range".format(idx))
+        shard = int(np.searchsorted(self.starts, idx, side="right")) - 1
+        return shard, idx - int(self.starts[shard])
+
+    def source(self, idx):
+        """Index of the source sample in the original dataset."""
+        shard, local = self.locate(idx)
+        return self.shards[shard]["sources"][local // self.k]
+
+    def replay(self, idx):
+        """Parameters of transforms applied to the sample, see ReplayCompose."""
+        shard, local = self.locate(idx)
+        if shard not in self._replays:
+            path = os.path.join(
+                self.out_dir, self.shards[shard]["name"] + ".replay.pkl"
+            )
+            with open(path, "rb") as f:
+                self._replays[shard] = pickle.load(f)  # skipcq: BAN-B301
+        return self._replays[shard][local]
+
+    def shard_target(self, shard, target):
+        key = (shard, target)
+        if key not in self._arrays:
+            name = self.shards[shard]["name"]
+            spec = self.shards[shard]["targets"][target]
+            offsets = np.load(
+                os.path.join(self.out_dir, "{}.{}.offsets.npy".format(name, target))
+            )
+            self._offsets[key] = offsets
+            shape = (int(offsets[-1]),) + tuple(spec["shape"])
+            if shape[0] == 0:
+                # empty files cannot be memory-mapped
+                self._arrays[key] = np.empty(shape, dtype=spec["dtype"])
+            else:
+                self._arrays[key] = np.memmap(
+                    os.path.join(self.out_dir, "{}.{}.bin".format(name, target)),
+                    dtype=spec["dtype"],
+                    mode="c",
+                    shape=shape,
+                )
+        return self._arrays[key], self._offsets[key]
+
+    def __getitem__(self, idx):
+        shard, local = self.locate(idx)
+        data = {}
+        for target in self.shards[shard]["targets"]:
+            array, offsets = self.shard_target(shard, target)
+            data[target] = array[offsets[local] : offsets[local + 1]]
+        return data
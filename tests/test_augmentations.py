@@ -1,14 +1,39 @@
 import numpy as np
 import pytest
+import volumentations.augmentations.functional as F
 from volumentations import (
+    BeamDownsample3d,
     Center3d,
+    ChromaticAutoContrast3d,
+    ChromaticJitter3d,
+    ChromaticTranslation3d,
+    Compose,
     Crop3d,
+    ElasticDistortion3d,
+    FarthestPointSample3d,
+    FeatureNoise3d,
+    Flip3d,
+    IntensityScale3d,
+    Jitter3d,
     Move3d,
+    MultiCrop3d,
     NoOp,
+    RandomCropToSize3d,
     RandomDropout3d,
+    RandomPatchDropout3d,
+    RandomSymmetry3d,
     RotateAroundAxis3d,
     Scale3d,
+    SpatialSort3d,
+    VoxelDownsample3d,
 )
+from volumentations.core import random_utils
+from volumentations.core.utils import thread_buffer
+
+
+def source_rows(points, selected):
+    """Index of the first row of ``points`` equal to every selected point."""
+    return (selected[:, None] == points[None]).all(axis=2).argmax(axis=1)
 
 
 @pytest.mark.parametrize(
@@ -20,6 +45,15 @@ from volumentations import (
         [RandomDropout3d, {"dropout_ratio": 0.0}],
         [Crop3d, {}],
         [NoOp, {}],
+        [VoxelDownsample3d, {"voxel_size": 1e-9}],
+        [ElasticDistortion3d, {"magnitude": 0}],
+        [Jitter3d, {"sigma": 0}],
+        [FeatureNoise3d, {"sigma": 0}],
+        [ChromaticJitter3d, {"std": 0, "max_value": 1.0}],
+        [ChromaticAutoContrast3d, {"blend_factor": 0}],
+        [ChromaticTranslation3d, {"translation_ratio": 0, "max_value": 1.0}],
+        [IntensityScale3d, {"scale_limit": 0}],
+        [RandomPatchDropout3d, {"n_patches": 0}],
     ],
 )
 def test_augmentations_wont_change_input(
@@ -61,3 +95,324 @@ def test_center(points, features, labels, normals, bboxes, cameras):
     np.testing.assert_allclose(data["features"], features_copy)
     np.testing.assert_allclose(data["labels"], labels_copy)
     np.testing.assert_allclose(data["normals"], normals_copy)
+
+
+@pytest.mark.parametrize("reduce", ["first", "random", "mean"])
+def test_voxel_downsample(reduce, features, labels, normals):
+    points = np.random.random((100, 3)) * 4
+    aug = VoxelDownsample3d(voxel_size=1.0, reduce=reduce, p=1)
+    data = aug(
+        points=points.copy(),
+        features=features,
+        labels=labels,
+        normals=normals,
+    )
+    voxels = np.floor(data["points"]).astype(int)
+    assert len(np.unique(voxels, axis=0)) == len(data["points"])
+    assert len(np.unique(np.floor(points), axis=0)) == len(data["points"])
+    assert len(data["features"]) == len(data["points"])
+    assert len(data["labels"]) == len(data["points"])
+    assert len(data["normals"]) == len(data["points"])
+    if reduce != "mean":
+        rows = np.nonzero((points[:, None] == data["points"][None]).all(axis=2))[0]
+        assert np.array_equal(features[rows], data["features"])
+        assert np.array_equal(labels[rows], data["labels"])
+
+
+@pytest.mark.parametrize("method", ["exact", "grid"])
+@pytest.mark.parametrize("n_points", [1, 30, 100, 200])
+def test_farthest_point_sample(method, n_points, points, features, labels, normals):
+    aug = FarthestPointSample3d(n_points=n_points, method=method, p=1)
+    data = aug(points=points, features=features, labels=labels, normals=normals)
+    expected = min(n_points, len(points))
+    assert len(np.unique(data["points"], axis=0)) == expected
+    rows = source_rows(points, data["points"])
+    assert np.array_equal(features[rows], data["features"])
+    assert np.array_equal(labels[rows], data["labels"])
+    assert np.array_equal(normals[rows], data["normals"])
+
+
+def test_jitter_reuses_noise_buffer(features, labels, normals):
+    aug = Jitter3d(sigma=0.1, clip=0.05, p=1)
+    points = np.random.random((100, 3))
+    data = aug(points=points.copy(), features=features, labels=labels)
+    assert np.abs(data["points"] - points).max() <= 0.05 + 1e-9
+    assert not np.allclose(data["points"], points)
+    buffer = thread_buffer("noise", 0, np.float64).base
+    aug(points=np.random.random((50, 3)))
+    assert thread_buffer("noise", 0, np.float64).base is buffer
+    aug(points=np.random.random((200, 3)))
+    assert thread_buffer("noise", 0, np.float64).base.size >= 600
+
+
+def test_feature_noise_columns(points):
+    features = np.random.random((100, 4))
+    aug = FeatureNoise3d(sigma=0.1, columns=[1, 3], p=1)
+    data = aug(points=points.copy(), features=features.copy())
+    assert np.array_equal(data["features"][:, [0, 2]], features[:, [0, 2]])
+    assert not np.allclose(data["features"][:, [1, 3]], features[:, [1, 3]])
+    assert np.array_equal(data["points"], points)
+
+
+@pytest.mark.parametrize(
+    ["augmentation_cls", "params"],
+    [
+        [ChromaticJitter3d, {"std": 0.1, "max_value": 1.0}],
+        [ChromaticAutoContrast3d, {"blend_factor": 1.0, "max_value": 1.0}],
+        [ChromaticTranslation3d, {"translation_ratio": 0.5, "max_value": 1.0}],
+        [IntensityScale3d, {"scale_limit": (0.5, 1.0), "columns": [3]}],
+    ],
+)
+def test_feature_augmentations_change_selected_columns(
+    augmentation_cls, params, points, features
+):
+    aug = augmentation_cls(p=1, **params)
+    data = aug(points=points.copy(), features=features.copy())
+    columns = aug.columns
+    others = [c for c in range(features.shape[1]) if c not in columns]
+    assert not np.allclose(data["features"][:, columns], features[:, columns])
+    assert np.array_equal(data["features"][:, others], features[:, others])
+    assert np.array_equal(data["points"], points)
+
+
+def test_random_symmetry_is_exact(points, normals):
+    aug = RandomSymmetry3d(p=1)
+    data = aug(points=points.copy(), normals=normals.copy())
+    assert np.array_equal(
+        np.sort(np.abs(data["points"]), axis=1), np.sort(points, axis=1)
+    )
+    element = [np.flatnonzero(np.abs(data["points"][0]) == c)[0] for c in points[0]]
+    assert np.array_equal(np.abs(data["normals"][:, element]), normals)
+
+
+@pytest.mark.parametrize("n_points", [1, 50, 100, 150])
+def test_random_crop_to_size(n_points, points, features, labels):
+    aug = RandomCropToSize3d(n_points=n_points, p=1)
+    data = aug(points=points, features=features, labels=labels)
+    assert len(data["points"]) == n_points
+    assert len(data["features"]) == n_points
+    assert len(data["labels"]) == n_points
+    rows = source_rows(points, data["points"])
+    assert np.array_equal(features[rows], data["features"])
+
+
+def test_multi_crop(points, features, labels):
+    aug = MultiCrop3d(size=(0.5, 0.5, None), stride=(0.25, 0.25, None), p=1)
+    data = aug(points=points, features=features, labels=labels)
+    assert len(data["points"]) == len(data["features"]) == len(data["labels"])
+    for crop_points, crop_labels in zip(data["points"], data["labels"]):
+        rows = source_rows(points, crop_points)
+        assert np.array_equal(labels[rows], crop_labels)
+
+
+@pytest.mark.parametrize("order", ["morton", "hilbert"])
+def test_spatial_sort(order, points, features, labels):
+    aug = SpatialSort3d(order=order, p=1)
+    data = aug(points=points.copy(), features=features, labels=labels)
+    order = np.lexsort(points.T)
+    assert np.array_equal(data["points"][np.lexsort(data["points"].T)], points[order])
+    rows = source_rows(points, data["points"])
+    assert np.array_equal(features[rows], data["features"])
+    assert np.array_equal(labels[rows], data["labels"])
+
+
+@pytest.mark.parametrize("bits", [0, 22])
+def test_spatial_sort_bits(bits):
+    with pytest.raises(ValueError):
+        SpatialSort3d(bits=bits)
+
+
+@pytest.mark.parametrize("reduce", ["first", "mean"])
+def test_float16_normals_and_features(monkeypatch, reduce):
+    monkeypatch.setattr(F, "CHUNK_SIZE", 64)
+    augmentation = Compose(
+        [
+            RotateAroundAxis3d(p=1),
+            RandomSymmetry3d(p=1),
+            Flip3d(p=1),
+            VoxelDownsample3d(voxel_size=0.05, reduce=reduce),
+            ChromaticAutoContrast3d(p=1),
+            ChromaticTranslation3d(p=1),
+            ChromaticJitter3d(p=1),
+            FeatureNoise3d(sigma=1, columns=[3], p=1),
+            IntensityScale3d(columns=[3], p=1),
+        ]
+    )
+    points = np.random.random((1000, 3)).astype(np.float32)
+    normals = np.random.randn(1000, 3)
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    features = np.random.random((1000, 4)) * [255, 255, 255, 10]
+    outputs = {}
+    for dtype in (np.float32, np.float16):
+        random_utils.seed(0)
+        outputs[dtype] = augmentation(
+            points=points.copy(),
+            normals=normals.astype(dtype),
+            features=features.astype(dtype),
+        )
+    assert outputs[np.float16]["normals"].dtype == np.float16
+    assert outputs[np.float16]["features"].dtype == np.float16
+    assert np.allclose(
+        outputs[np.float16]["normals"], outputs[np.float32]["normals"], atol=5e-3
+    )
+    assert np.allclose(
+        outputs[np.float16]["features"],
+        outputs[np.float32]["features"],
+        rtol=5e-3,
+        atol=5e-2,
+    )
+
+
+def make_sweep(n_beams=64, n_azimuths=100):
+    elevation = np.deg2rad(np.linspace(-25, 3, n_beams))
+    azimuth = np.linspace(0, 2 * np.pi, n_azimuths, endpoint=False)
+    elevation, azimuth = np.meshgrid(elevation, azimuth, indexing="ij")
+    distance = np.random.uniform(5, 50, elevation.shape)
+    points = np.stack(
+        [
+            distance * np.cos(elevation) * np.cos(azimuth),
+            distance * np.cos(elevation) * np.sin(azimuth),
+            distance * np.sin(elevation),
+        ],
+        axis=-1,
+    ).reshape(-1, 3)
+    rings = np.repeat(np.arange(n_beams), n_azimuths)
+    return points, rings
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"target_beams": 16},
+        {"target_beams": 16, "ring_column": 1},
+        {"keep_ratio": 0.25},
+        {"keep_ratio": 0.25, "ring_column": 1},
+    ],
+)
+def test_beam_downsample(params):
+    points, rings = make_sweep()
+    features = np.stack([np.random.random(len(rings)), rings], axis=1)
+    aug = BeamDownsample3d(p=1, **params)
+    data = aug(points=points, features=features, labels=rings)
+    kept = np.unique(data["labels"])
+    assert len(kept) == 16
+    assert len(data["points"]) == 16 * 100
+    assert np.all(np.diff(kept) == 4)
+    assert np.array_equal(data["features"][:, 1], data["labels"])
+
+
+@pytest.mark.parametrize(
+    "aug",
+    [
+        Scale3d(p=1),
+        RotateAroundAxis3d(axis=(1, 1, 0), p=1),
+        RotateAroundAxis3d(center_point=(1, 2, 3), p=1),
+        Center3d(offset=(1, 2, 3), p=1),
+        Move3d(offset=(1, 2, 3)),
+        Flip3d(axis=(0, 1, 0), p=1),
+        RandomSymmetry3d(p=1),
+        RandomDropout3d(p=1),
+        IntensityScale3d(p=1),
+        NoOp(),
+    ],
+)
+def test_affine_target(aug, points, features):
+    data = aug(
+        points=points.copy(),
+        features=features,
+        index=np.arange(len(points)),
+        affine=np.eye(4),
+    )
+    source = points[data["index"]]
+    expected = source @ data["affine"][:3, :3].T + data["affine"][:3, 3]
+    assert np.allclose(data["points"], expected)
+
+
+def test_affine_target_is_none_after_non_affine(points):
+    data = Jitter3d(p=1)(points=points.copy(), affine=np.eye(4))
+    assert data["affine"] is None
+    data = Scale3d(p=1)(points=data["points"], affine=data["affine"])
+    assert data["affine"] is None
+
+
+def make_grid_mesh(n=20):
+    x, y = np.meshgrid(np.arange(n), np.arange(n), indexing="ij")
+    vertices = np.stack([x, y, np.zeros_like(x)], axis=-1).reshape(-1, 3) / n
+    corners = (np.arange(n - 1)[:, None] * n + np.arange(n - 1)).ravel()
+    faces = np.concatenate(
+        [
+            np.stack([corners, corners + n, corners + 1], axis=1),
+            np.stack([corners + 1, corners + n, corners + n + 1], axis=1),
+        ]
+    ).astype(np.int32)
+    return vertices, faces
+
+
+@pytest.mark.parametrize(
+    "aug",
+    [
+        Crop3d(x_min=0.2, x_max=0.7, p=1),
+        RandomDropout3d(dropout_ratio=0.3, p=1),
+        FarthestPointSample3d(n_points=100, p=1),
+        SpatialSort3d(p=1),
+    ],
+)
+def test_faces_of_subsets(aug):
+    vertices, faces = make_grid_mesh()
+    data = aug(points=vertices.copy(), faces=faces, index=np.arange(len(vertices)))
+    assert data["faces"].dtype == faces.dtype
+    kept = np.isin(faces, data["index"]).all(axis=1)
+    assert len(data["faces"]) == kept.sum()
+    assert np.array_equal(
+        np.unique(data["index"][data["faces"]], axis=0), np.unique(faces[kept], axis=0)
+    )
+
+
+def test_faces_of_rigid_transforms_and_reflections():
+    vertices, faces = make_grid_mesh()
+    data = RotateAroundAxis3d(p=1)(points=vertices.copy(), faces=faces)
+    assert data["faces"] is faces
+    data = Flip3d(p=1)(points=vertices.copy(), faces=faces)
+    assert np.array_equal(data["faces"], faces[:, ::-1])
+
+
+@pytest.mark.parametrize("reduce", ["first", "random", "mean"])
+def test_faces_of_voxel_downsample(reduce):
+    vertices, faces = make_grid_mesh()
+    aug = VoxelDownsample3d(voxel_size=0.1, reduce=reduce)
+    voxels = F.voxel_keys(vertices, 0.1)
+    for _ in range(10):
+        data = aug(points=vertices.copy(), faces=faces, index=np.arange(len(vertices)))
+        assert len(data["faces"]) > 0
+        assert np.all(np.diff(np.sort(data["faces"], axis=1), axis=1) > 0)
+        # a face vertex is the vertex kept in the voxel of the input vertex
+        collapsed = voxels[faces]
+        collapsed = collapsed[
+            (collapsed[:, 0] != collapsed[:, 1])
+            & (collapsed[:, 1] != collapsed[:, 2])
+            & (collapsed[:, 0] != collapsed[:, 2])
+        ]
+        remapped = voxels[data["index"]][data["faces"]]
+        assert np.array_equal(collapsed, remapped)
+
+
+@pytest.mark.parametrize(
+    "aug",
+    [
+        ChromaticJitter3d(std=0.05, p=1),
+        ChromaticTranslation3d(translation_ratio=0.5, p=1),
+        ChromaticAutoContrast3d(blend_factor=1.0, p=1),
+        IntensityScale3d(scale_limit=0.9, p=1),
+        FeatureNoise3d(sigma=20, p=1),
+    ],
+)
+def test_uint8_colors(aug, points):
+    colors = np.random.randint(0, 256, (len(points), 3)).astype(np.uint8)
+    random_utils.seed(0)
+    expected = aug(points=points.copy(), features=colors.astype(np.float32))
+    random_utils.seed(0)
+    data = aug(points=points.copy(), features=colors.copy())
+    assert data["features"].dtype == np.uint8
+    clipped = np.clip(np.rint(expected["features"]), 0, 255)
+    assert np.abs(data["features"].astype(np.float64) - clipped).max() <= 1
+    assert not np.array_equal(data["features"], colors)
@@ -1,23 +1,39 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from unittest import mock
 from unittest.mock import Mock, MagicMock, call
 
 import numpy as np
 import pytest
 
+from volumentations.core import random_utils
+from volumentations.core.layout import PointLayout
+from volumentations.core.utils import thread_pool
 from volumentations.core.transforms_interface import to_tuple, PointCloudsTransform
 from volumentations.core.composition import (
     OneOrOther,
     Compose,
     OneOf,
+    RandomOrder,
     ReplayCompose,
+    SequenceCompose,
+    SomeOf,
+    TTACompose,
+    alias_table,
 )
 from volumentations.augmentations.transforms import (
+    FarthestPointSample3d,
+    VoxelDownsample3d,
     Scale3d,
     RotateAroundAxis3d,
     Move3d,
+    MultiCrop3d,
     Center3d,
     RandomDropout3d,
     Flip3d,
+    Crop3d,
+    Jitter3d,
 )
 
 
@@ -75,3 +91,408 @@ def test_to_tuple():
     assert to_tuple(100, low=30) == (30, 100)
     assert to_tuple(10, bias=1) == (-9, 11)
     assert to_tuple(100, bias=2) == (-98, 102)
+
+
+def test_compose_reorder_subsamples_first():
+    scale = Scale3d(p=1)
+    rotate = RotateAroundAxis3d(center_point=(0, 0, 0), p=1)
+    center = Center3d(p=1)
+    crop = Crop3d()
+    first_dropout = RandomDropout3d(p=1)
+    second_dropout = RandomDropout3d(p=1)
+    transforms = [center, scale, first_dropout, crop, rotate, second_dropout]
+    augmentation = Compose(transforms, reorder=True)
+    assert augmentation.transforms.transforms == [
+        center,
+        first_dropout,
+        scale,
+        crop,
+        second_dropout,
+        rotate,
+    ]
+    assert Compose(transforms).transforms.transforms == transforms
+    data = augmentation(points=np.random.random((100, 3)))
+    assert len(data["points"]) == 64
+
+
+def test_rotate_around_mean_is_not_pointwise():
+    assert not RotateAroundAxis3d().pointwise
+    assert RotateAroundAxis3d(center_point=(0, 0, 0)).pointwise
+
+
+def test_compose_plan_flattens_nested_compose():
+    first = MagicMock(p=1, always_apply=False)
+    second = MagicMock(p=0, always_apply=False)
+    skipped = MagicMock(p=1, always_apply=False)
+    skipped_always = MagicMock(p=1, always_apply=True)
+    augmentation = Compose(
+        [first, Compose([second, first], p=1), Compose([skipped, skipped_always], p=0)]
+    )
+    assert len(augmentation.plan) == 7
+    assert augmentation.draw_plan().shape == (7,)
+    assert augmentation.draw_plan(batch_size=5).shape == (5, 7)
+    augmentation(points=np.ones((10, 3)))
+    assert first.call_count == 2
+    assert not second.called
+    assert not skipped.called
+    assert skipped_always.called
+
+
+def test_compose_plan_reads_changed_p():
+    move = Move3d(offset=(1, 0, 0), p=0)
+    augmentation = Compose([Compose([move])])
+    points = np.zeros((5, 3))
+    assert np.array_equal(augmentation(points=points.copy())["points"], points)
+    move.p = 1
+    assert np.array_equal(
+        augmentation(points=points.copy())["points"], points + [1, 0, 0]
+    )
+    move.p = 0
+    move.always_apply = True
+    augmentation.transforms[0].p = 0
+    assert np.array_equal(
+        augmentation(points=points.copy())["points"], points + [1, 0, 0]
+    )
+
+
+def test_compose_apply_plan():
+    transforms = [MagicMock(p=0.5, always_apply=False) for _ in range(4)]
+    for transform in transforms:
+        transform.side_effect = lambda force_apply, **data: data
+    augmentation = Compose(transforms)
+    plan = np.array([True, False, False, True])
+    augmentation.apply_plan(plan, points=np.ones((10, 3)))
+    assert [transform.called for transform in transforms] == list(plan)
+    augmentation.apply_plan(plan, force_apply=True, points=np.ones((10, 3)))
+    assert all(transform.called for transform in transforms)
+
+
+def test_compose_plan_skips_unselected_one_of():
+    always = MagicMock(p=1, always_apply=True)
+    augmentation = Compose([OneOf([always], p=0), OneOrOther(always, always, p=1)])
+    augmentation(points=np.ones((10, 3)))
+    assert always.call_count == 1
+
+
+@pytest.mark.parametrize("replace", [False, True])
+@pytest.mark.parametrize(
+    "ps", [[1] * 10, [0.1, 0.5, 1, 0.2, 0.3, 0.9, 0.4, 0.8, 0.7, 0.6]]
+)
+def test_some_of(replace, ps):
+    transforms = [Mock(p=p, side_effect=lambda force_apply, **data: data) for p in ps]
+    augmentation = SomeOf(transforms, n=3, replace=replace)
+    augmentation(points=np.ones((10, 3)))
+    calls = sum(transform.call_count for transform in transforms)
+    assert calls == 3
+    if not replace:
+        assert len([t for t in transforms if t.called]) == 3
+
+
+def test_some_of_with_replacement_is_not_replayed():
+    with pytest.raises(ValueError):
+        ReplayCompose([SomeOf([Scale3d(), Move3d()], n=2, replace=True)])
+    ReplayCompose([SomeOf([Scale3d(), Move3d()], n=2)])
+
+
+def test_alias_table():
+    probabilities = [0.1, 0.2, 0.3, 0.4]
+    prob, alias = alias_table(probabilities)
+    sampled = np.zeros(4)
+    for idx, (keep, other) in enumerate(zip(prob, alias)):
+        sampled[idx] += keep / 4
+        sampled[other] += (1 - keep) / 4
+    assert np.allclose(sampled, probabilities)
+
+
+def test_random_order_replay():
+    augmentation = ReplayCompose(
+        [
+            RandomOrder(
+                [Scale3d(p=1), RotateAroundAxis3d(p=1), Move3d(offset=(1, 2, 3), p=1)]
+            )
+        ]
+    )
+    points = np.random.random((10, 3))
+    data = augmentation(points=points.copy())
+    replayed = ReplayCompose.replay(data["replay"], points=points.copy())
+    assert np.allclose(data["points"], replayed["points"])
+
+
+def test_random_order_keeps_probabilities():
+    augmentation = Compose(
+        [RandomOrder([Move3d(offset=(1, 0, 0), p=0), Move3d(offset=(0, 1, 0), p=1)])]
+    )
+    for _ in range(10):
+        data = augmentation(points=np.zeros((5, 3)))
+        assert np.array_equal(data["points"], np.tile([0.0, 1.0, 0.0], (5, 1)))
+
+
+def test_tta_compose():
+    augmentation = TTACompose(
+        [
+            Scale3d(p=1),
+            RotateAroundAxis3d(rotation_limit=np.pi, p=1),
+            RandomDropout3d(dropout_ratio=0.5, p=1),
+            Move3d(offset=(1, 2, 3)),
+        ],
+        n_variants=3,
+    )
+    points = np.random.random((100, 3))
+    labels = np.arange(100) % 7
+    variants = augmentation(points=points.copy(), labels=labels)
+    assert len(variants) == 3
+    for variant, again in zip(variants, augmentation(points=points.copy())):
+        assert np.array_equal(variant["points"], again["points"])
+    for variant in variants:
+        indexes = variant["tta"]["indexes"]
+        assert len(indexes) == 50
+        assert np.array_equal(variant["labels"], labels[indexes])
+        homogeneous = np.hstack([variant["points"], np.ones((50, 1))])
+        restored = homogeneous @ variant["tta"]["inverse_affine"].T
+        assert np.allclose(restored[:, :3], points[indexes])
+    predictions = [np.stack([v["labels"]] * 2, axis=1) for v in variants]
+    merged, counts = augmentation.merge(predictions, variants, n_points=100)
+    present = counts > 0
+    assert np.allclose(merged[present], np.stack([labels] * 2, axis=1)[present])
+    assert np.isnan(merged[~present]).all()
+    with pytest.raises(ValueError):
+        augmentation.merge([], [], n_points=100)
+
+
+def z_pose(angle, offset):
+    affine = np.eye(4)
+    affine[:2, :2] = [[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]
+    affine[:3, 3] = offset
+    return affine
+
+
+@pytest.mark.parametrize("with_poses", [False, True])
+def test_sequence_compose(with_poses):
+    augmentation = SequenceCompose(
+        [
+            Scale3d(p=1),
+            RotateAroundAxis3d(rotation_limit=np.pi, p=1),
+            Flip3d(p=1),
+            Move3d(offset=(1, 2, 3)),
+        ]
+    )
+    frames = [np.random.random((n, 3)) for n in (30, 10, 20)]
+    labels = [np.full(len(frame), k) for k, frame in enumerate(frames)]
+    poses = [z_pose(0.1 * k, (k, 0, 0)) for k in range(3)] if with_poses else None
+    random_utils.seed(0)
+    data = augmentation(points=[f.copy() for f in frames], labels=labels, poses=poses)
+    sequence = data["sequence"]
+    assert np.array_equal(sequence["offsets"], [0, 30, 40, 60])
+    for k, frame in enumerate(frames):
+        affine = sequence["affines"][k]
+        expected = frame @ affine[:3, :3].T + affine[:3, 3]
+        assert np.allclose(data["points"][k], expected)
+        assert np.array_equal(data["labels"][k], labels[k])
+        assert np.array_equal(sequence["index"][k], np.arange(len(frame)))
+    if not with_poses:
+        assert np.allclose(sequence["affines"], sequence["affines"][0])
+
+    random_utils.seed(0)
+    packed = augmentation(
+        points=np.concatenate(frames),
+        labels=np.concatenate(labels),
+        offsets=[0, 30, 40, 60],
+        poses=poses,
+    )
+    assert np.allclose(packed["points"], np.concatenate(data["points"]))
+    assert np.allclose(packed["sequence"]["affines"], sequence["affines"])
+
+
+def test_sequence_compose_subsets():
+    augmentation = SequenceCompose(
+        [RandomDropout3d(dropout_ratio=0.5, p=1), Jitter3d(p=1)]
+    )
+    frames = np.random.random((60, 3))
+    labels = np.arange(60)
+    data = augmentation(points=frames, labels=labels, offsets=[0, 30, 40, 60])
+    sequence = data["sequence"]
+    assert sequence["affines"] is None
+    assert sequence["offsets"][-1] == 30
+    frame = np.searchsorted(sequence["offsets"], np.arange(30), side="right") - 1
+    starts = np.array([0, 30, 40])
+    assert np.array_equal(data["labels"], starts[frame] + sequence["index"])
+
+
+def test_tta_compose_affine_of_params():
+    augmentation = TTACompose(
+        [
+            Center3d(p=1),
+            RotateAroundAxis3d(rotation_limit=np.pi, axis=(1, 1, 1), p=1),
+            Flip3d(p=1),
+            Crop3d(x_min=-0.1, x_max=0.1, y_min=-0.1, y_max=0.1, p=1),
+        ],
+        n_variants=3,
+    )
+    # planar cloud, few points remain after the crop
+    points = np.random.random((30, 3))
+    points[:, 2] = 0
+    for variant in augmentation(points=points.copy()):
+        indexes = variant["tta"]["indexes"]
+        affine = variant["tta"]["affine"]
+        assert np.allclose(np.linalg.det(affine[:3, :3]) ** 2, 1)
+        expected = points[indexes] @ affine[:3, :3].T + affine[:3, 3]
+        assert np.allclose(variant["points"], expected)
+
+    variants = TTACompose([Scale3d(p=1), Jitter3d(p=1)])(points=points.copy())
+    assert all(v["tta"]["affine"] is None for v in variants)
+    assert all(v["tta"]["inverse_affine"] is None for v in variants)
+
+
+def test_compose_track_index():
+    augmentation = Compose(
+        [
+            Crop3d(x_max=0.8),
+            RandomDropout3d(p=1),
+            VoxelDownsample3d(voxel_size=0.05),
+            FarthestPointSample3d(n_points=20),
+            Move3d(offset=(1, 1, 1)),
+        ],
+        track_index=True,
+    )
+    points = np.random.random((200, 3))
+    labels = np.arange(200)
+    data = augmentation(points=points.copy(), labels=labels)
+    assert data["index"].dtype == np.int32
+    assert len(data["index"]) == 20
+    assert np.array_equal(data["index"], data["labels"])
+    assert np.allclose(data["points"], points[data["index"]] + 1)
+    assert "index" not in Compose([Move3d()])(points=points)
+
+
+@pytest.mark.parametrize("p", [0, 1])
+def test_nested_compose_track_index(p):
+    inner = Compose(
+        [RandomDropout3d(p=1), Move3d(offset=(1, 1, 1))], track_index=True, p=p
+    )
+    points = np.random.random((200, 3))
+    data = Compose([Scale3d(p=0), inner])(points=points.copy())
+    assert np.allclose(data["points"], points[data["index"]] + p)
+    assert len(data["index"]) == (160 if p else 200)
+
+
+def test_nested_compose_layout():
+    points = np.random.random((100, 3))
+    cloud = np.hstack([points, np.arange(100)[:, None]])
+    inner = Compose(
+        [Crop3d(x_max=0.5, p=1), Move3d(offset=(1, 1, 1))],
+        layout={"points": (0, 3), "labels": 3},
+    )
+    data = Compose([inner])(cloud=cloud.copy())
+    labels = data["cloud"][:, 3].astype(int)
+    assert np.allclose(data["cloud"][:, :3], points[labels] + 1)
+    assert np.all(points[labels, 0] < 0.5)
+
+
+def test_random_streams_of_threads():
+    assert random_utils.get_random() is random
+    assert random_utils.get_np_random() is np.random
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        stream = executor.submit(random_utils.get_random).result()
+    assert isinstance(stream, random.Random)
+    assert stream is not random
+
+
+def test_compose_shared_by_threads():
+    augmentation = Compose(
+        [
+            RandomOrder([Scale3d(p=1), RotateAroundAxis3d(p=1), Jitter3d(p=1)]),
+            RandomDropout3d(dropout_ratio=0.3, p=1),
+        ]
+    )
+    points = np.random.random((1000, 3))
+    barrier = threading.Barrier(4)
+
+    def run(seed):
+        random_utils.seed(seed)
+        barrier.wait(timeout=10)
+        return [augmentation(points=points.copy())["points"] for _ in range(10)]
+
+    def run_alone(seed):
+        random_utils.seed(seed)
+        return [augmentation(points=points.copy())["points"] for _ in range(10)]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(run, range(4)))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        expected = list(executor.map(run_alone, range(4)))
+    for result, expected_result in zip(results, expected):
+        for a, b in zip(result, expected_result):
+            assert np.array_equal(a, b)
+
+
+def test_point_layout_stacked():
+    cloud = np.random.random((10, 9))
+    layout = PointLayout(points=(0, 3), normals=(3, 6), features=(6, 9))
+    stacked = layout.stacked(cloud, "points", "normals")
+    assert stacked.shape == (10, 2, 3)
+    assert np.shares_memory(stacked, cloud)
+    assert np.array_equal(stacked[:, 1], cloud[:, 3:6])
+    assert layout.stacked(cloud, "points", "features") is None
+    assert layout.covers(9)
+    assert not PointLayout(points=(0, 3)).covers(9)
+
+
+@pytest.mark.parametrize("reduce", ["first", "mean"])
+def test_compose_layout(reduce):
+    transforms = [
+        Crop3d(x_max=0.9),
+        RandomDropout3d(dropout_ratio=0.3, p=1),
+        RotateAroundAxis3d(p=1),
+        Scale3d(p=1),
+        VoxelDownsample3d(voxel_size=0.1, reduce=reduce),
+        Move3d(offset=(1, 2, 3)),
+    ]
+    points = np.random.random((500, 3))
+    normals = np.random.random((500, 3))
+    labels = np.arange(500) % 5
+    cloud = np.hstack([points, normals, labels[:, None]])
+    layout = PointLayout(points=(0, 3), normals=(3, 6), labels=6)
+
+    random_utils.seed(0)
+    expected = Compose(transforms)(
+        points=points.copy(), normals=normals.copy(), labels=labels
+    )
+    random_utils.seed(0)
+    data = Compose(transforms, layout=layout, track_index=True)(cloud=cloud)
+    views = layout.views(data["cloud"])
+    assert np.allclose(views["points"], expected["points"])
+    assert np.allclose(views["normals"], expected["normals"])
+    assert np.array_equal(views["labels"], expected["labels"])
+    assert np.array_equal(views["labels"], labels[data["index"]])
+
+
+def test_compose_out():
+    augmentation = Compose(
+        [Crop3d(x_max=0.8), RandomDropout3d(dropout_ratio=0.3, p=1), Move3d()],
+        track_index=True,
+    )
+    points = np.random.random((1000, 3))
+    labels = np.arange(1000)
+    out = {"points": np.empty((1000, 3)), "labels": np.empty(1000, dtype=np.int64)}
+    pool = thread_pool()
+    buffers = None
+    for seed in range(3):
+        random_utils.seed(seed)
+        expected = augmentation(points=points.copy(), labels=labels)
+        random_utils.seed(seed)
+        data = augmentation(points=points.copy(), labels=labels, out=out)
+        assert np.shares_memory(data["points"], out["points"])
+        assert np.shares_memory(data["labels"], out["labels"])
+        assert not pool.owns(data["index"])
+        for target in ("points", "labels", "index"):
+            assert np.array_equal(data[target], expected[target])
+        free = {id(b) for sizes in pool.free.values() for b in sizes}
+        if buffers is not None:
+            # intermediates of later calls reuse buffers of the first call
+            assert free == buffers
+        buffers = free
+    with pytest.raises(ValueError):
+        augmentation(points=points.copy(), out={"points": np.empty((10, 3))})
+    crops = Compose([MultiCrop3d(size=(0.5, 0.5, None))])
+    with pytest.raises(ValueError):
+        crops(points=points.copy(), out={"points": np.empty((1000, 3))})
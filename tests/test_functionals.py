@@ -1,6 +1,10 @@
+import multiprocessing
+
 import numpy as np
 import pytest
 import volumentations.augmentations.functional as F
+from volumentations.augmentations import backends
+from volumentations.core.utils import thread_pool
 
 
 @pytest.mark.parametrize(
@@ -118,3 +122,302 @@ def test_scale(points, expected_points, scale_factor):
 def test_flip(points, expected_points, axis):
     processed_points = F.flip_coordinates(points, axis)
     assert np.allclose(expected_points, processed_points)
+
+
+def test_voxelize():
+    points = np.array(
+        [[0.1, 0.1, 0.1], [2.5, 0.0, 0.0], [0.2, 0.3, 0.4], [2.1, 0.9, 0.5]]
+    )
+    first, inverse, counts = F.voxelize(points, voxel_size=1.0)
+    assert np.array_equal(first, [0, 1])
+    assert np.array_equal(inverse, [0, 1, 0, 1])
+    assert np.array_equal(counts, [2, 2])
+    means = F.voxel_mean(points, inverse, counts)
+    assert np.allclose(means, [[0.15, 0.2, 0.25], [2.3, 0.45, 0.25]])
+    assert np.array_equal(F.voxel_members(inverse, counts, np.array([1, 1])), [2, 3])
+
+
+def test_voxelize_huge_grid():
+    points = np.array([[0, 0, 0], [1e12, 1e12, 1e12], [0, 0, 0]], dtype=float)
+    first, inverse, counts = F.voxelize(points, voxel_size=1e-6)
+    assert np.array_equal(first, [0, 1])
+    assert np.array_equal(inverse, [0, 1, 0])
+
+
+def test_farthest_point_sampling():
+    points = np.array([[0, 0, 0], [0.1, 0, 0], [5, 0, 0], [0, 3, 0], [4.9, 0, 0]])
+    indexes = F.farthest_point_sampling(points, 3, start=0)
+    assert np.array_equal(indexes, [0, 2, 3])
+    assert len(F.farthest_point_sampling(points, 10)) == len(points)
+
+
+def test_grid_sampling(points):
+    indexes = F.grid_sampling(points, 20)
+    assert len(indexes) >= 20
+    assert len(np.unique(indexes)) == len(indexes)
+
+
+def test_trilinear_interpolation():
+    grid = np.arange(8, dtype=float).reshape(2, 2, 2, 1)
+    coords = np.array([[0, 0, 0], [1, 1, 1], [0.5, 0.5, 0.5], [0, 0, 0.25], [5, 5, 5]])
+    values = F.trilinear_interpolation(grid, coords)
+    assert np.allclose(values[:, 0], [0, 7, 3.5, 0.25, 7])
+
+
+def test_smooth_noise_keeps_constant_grid():
+    noise = np.full((4, 5, 6, 3), 2.0)
+    assert np.allclose(F.smooth_noise(noise), noise)
+
+
+def test_elastic_distortion_is_smooth():
+    points = np.random.random((1000, 3))
+    noise = F.smooth_noise(np.random.randn(8, 8, 8, 3))
+    distorted = F.elastic_distortion(points.copy(), noise, -0.2, 0.2, 0.1)
+    assert np.abs(distorted - points).max() < 0.5
+    assert not np.allclose(distorted, points)
+
+
+@pytest.mark.parametrize(
+    ["columns", "expected"],
+    [
+        (None, slice(None)),
+        ([0, 1, 2], slice(0, 3)),
+        ((3,), slice(3, 4)),
+        ([-1], slice(-1, None)),
+        ([-3, -2], slice(-3, -1)),
+        ([0, 2], [0, 2]),
+        ([-1, 0], [-1, 0]),
+    ],
+)
+def test_columns_index(columns, expected):
+    assert F.columns_index(columns) == expected
+
+
+def test_auto_contrast():
+    values = np.array([[10.0, 20.0], [20.0, 20.0], [30.0, 20.0]])
+    contrasted = F.auto_contrast(values.copy(), blend_factor=1.0, max_value=255.0)
+    assert np.allclose(contrasted[:, 0], [0, 127.5, 255])
+    assert np.allclose(contrasted[:, 1], 0)
+    assert np.allclose(F.auto_contrast(values.copy(), 0.0), values)
+
+
+def test_apply_to_columns():
+    values = np.ones((5, 4))
+    F.apply_to_columns(F.scale_intensity, values, [0, 2], 3.0)
+    assert np.allclose(values, [[3, 1, 3, 1]] * 5)
+    F.apply_to_columns(F.translate_colors, values, [1, 2, 3], [1, 2, 300], 255.0)
+    assert np.allclose(values, [[3, 2, 5, 255]] * 5)
+
+
+@pytest.mark.parametrize(
+    ["axes", "include_reflections", "size"],
+    [((0, 1, 2), True, 48), ((0, 1, 2), False, 24), ((0, 1), True, 8), ((2,), True, 2)],
+)
+def test_symmetry_group(axes, include_reflections, size):
+    group = F.symmetry_group(axes, include_reflections)
+    assert len(group) == size
+    matrices = {
+        tuple((np.eye(3, dtype=int)[:, permutation] * signs).ravel())
+        for permutation, signs in group
+    }
+    assert len(matrices) == size
+    for permutation, signs in group:
+        matrix = np.eye(3)[:, permutation] * signs
+        assert np.allclose(matrix @ matrix.T, np.eye(3))
+        if not include_reflections:
+            assert np.isclose(np.linalg.det(matrix), 1)
+
+
+def test_permute_axes():
+    points = np.array([[1.0, 2.0, 3.0, 4.0]])
+    permuted = F.permute_axes(points, np.array([1, 0, 2]), np.array([1, -1, 1]))
+    assert np.array_equal(permuted, [[2.0, -1.0, 3.0, 4.0]])
+
+
+@pytest.mark.parametrize("shape", ["sphere", "cube"])
+def test_patch_dropout(shape):
+    points = np.random.random((2000, 3)) * 10 - 5
+    centers = points[:7]
+    keep = F.patch_dropout(points, centers, 0.7, shape=shape)
+    delta = points[:, None] - centers[None]
+    if shape == "sphere":
+        expected = (np.linalg.norm(delta, axis=2) > 0.7).all(axis=1)
+    else:
+        expected = (np.abs(delta) > 0.7).any(axis=2).all(axis=1)
+    assert np.array_equal(keep, expected)
+    assert not keep[:7].any()
+
+
+def test_patch_dropout_large_extent():
+    anchors = np.random.random((7, 3)) * 2e7 - 1e7
+    points = (anchors[:, None] + np.random.random((7, 300, 3)) * 4e-3 - 2e-3).reshape(
+        -1, 3
+    )
+    centers = points[::300]
+    keep = F.patch_dropout(points, centers, 1e-3)
+    distances = np.linalg.norm(points[:, None] - centers[None], axis=2)
+    assert np.array_equal(keep, (distances > 1e-3).all(axis=1))
+    assert not keep.all() and keep.any()
+
+
+def test_concatenate_ranges():
+    ranges = F.concatenate_ranges(np.array([5, 0, 10]), np.array([2, 0, 3]))
+    assert np.array_equal(ranges, [5, 6, 10, 11, 12])
+
+
+def test_nearest_points(points):
+    center = np.array([0.5, 0.5, 0.5])
+    indexes = F.nearest_points(points, center, 10)
+    distances = np.linalg.norm(points - center, axis=1)
+    assert np.array_equal(indexes, np.sort(np.argsort(distances)[:10]))
+
+
+@pytest.mark.parametrize(
+    ["size", "stride"],
+    [((0.3, 0.3, None), None), ((0.3, 0.5, 0.4), (0.2, 0.25, 0.3)), ((2, 2, 2), None)],
+)
+def test_multi_crop(size, stride):
+    points = np.random.random((500, 3))
+    indexes, corners = F.multi_crop(points, size, stride)
+    assert len(indexes) == len(corners)
+    for crop, corner in zip(indexes, corners):
+        bounds = [
+            (c, c + s) if s is not None else (-np.inf, np.inf)
+            for c, s in zip(corner, size)
+        ]
+        expected = F.crop(
+            points,
+            x_min=bounds[0][0],
+            x_max=bounds[0][1],
+            y_min=bounds[1][0],
+            y_max=bounds[1][1],
+            z_min=bounds[2][0],
+            z_max=bounds[2][1],
+        )
+        assert np.array_equal(crop, np.flatnonzero(expected))
+    covered = np.unique(np.concatenate(indexes))
+    assert np.array_equal(covered, np.arange(len(points)))
+
+
+@pytest.mark.parametrize("order", ["morton", "hilbert"])
+def test_space_filling_curve_codes(order):
+    grid = np.stack(np.meshgrid(*[np.arange(8.0)] * 3, indexing="ij"), axis=-1)
+    points = grid.reshape(-1, 3)
+    codes = (
+        F.morton_codes(points, 3) if order == "morton" else F.hilbert_codes(points, 3)
+    )
+    assert np.array_equal(np.sort(codes), np.arange(512))
+    steps = np.abs(np.diff(points[np.argsort(codes)], axis=0)).sum(axis=1)
+    if order == "hilbert":
+        assert steps.max() == 1
+    else:
+        assert codes[[1, 8, 64]].tolist() == [1, 2, 4]
+
+
+def test_float32_chunks(monkeypatch):
+    monkeypatch.setattr(F, "CHUNK_SIZE", 7)
+    values = np.random.random((50, 3)).astype(np.float16)
+    expected = values.astype(np.float32) * 3.3 + 0.1
+    result = F.scale_shift(values, 3.3, 0.1)
+    assert result is values
+    assert np.allclose(result, expected, rtol=1e-3)
+
+
+def test_float32_chunks_integers(monkeypatch):
+    monkeypatch.setattr(F, "CHUNK_SIZE", 7)
+    values = np.array([[0, 100, 250]] * 20, dtype=np.uint8)
+    result = F.translate_colors(values, [-10.4, 10.6, 10.0], max_value=300)
+    assert result is values
+    assert result.tolist() == [[0, 111, 255]] * 20
+
+
+def test_add_generated_noise_matches_single_draw(monkeypatch):
+    monkeypatch.setattr(F, "CHUNK_SIZE", 7)
+    values = np.zeros((50, 3), dtype=np.float16)
+    F.add_generated_noise(values, np.random.default_rng(5), sigma=0.5)
+    noise = np.random.default_rng(5).standard_normal((50, 3), dtype=np.float32)
+    assert np.allclose(values, noise * 0.5, rtol=1e-3, atol=1e-3)
+
+
+def test_voxel_mean_float16(monkeypatch):
+    monkeypatch.setattr(F, "CHUNK_SIZE", 7)
+    values = np.random.random((50, 3))
+    inverse = np.arange(50) % 4
+    counts = np.bincount(inverse)
+    means = F.voxel_mean(values.astype(np.float16), inverse, counts)
+    assert means.dtype == np.float16
+    assert np.allclose(means, F.voxel_mean(values, inverse, counts), atol=1e-3)
+
+
+def check_backend_matches_numpy(backend, dtype):
+    points = np.random.random((1000, 4)).astype(dtype)
+    numpy_crop = backends.get_implementation("crop", "numpy")
+    crop = backends.get_implementation("crop", backend)
+    bounds = (0.1, 0.2, -np.inf, 0.8, 0.9, 0.5)
+    assert np.array_equal(crop(points, *bounds), numpy_crop(points, *bounds))
+    with pytest.raises(ValueError):
+        crop(points, 1, 0, 0, 0, 1, 1)
+
+    numpy_scale = backends.get_implementation("scale", "numpy")
+    scale = backends.get_implementation("scale", backend)
+    expected = numpy_scale(points.copy(), (0.5, 2, 3))
+    assert np.allclose(scale(points.copy(), (0.5, 2, 3)), expected, rtol=1e-5)
+
+    numpy_rotate = backends.get_implementation("rotate_around_axis", "numpy")
+    rotate = backends.get_implementation("rotate_around_axis", backend)
+    for center_point in (None, (1, 2, 3)):
+        expected = numpy_rotate(points.copy(), (1, 1, 0), 0.7, center_point)
+        result = rotate(points.copy(), (1, 1, 0), 0.7, center_point)
+        assert np.allclose(result, expected, rtol=1e-5, atol=1e-5)
+        assert np.array_equal(result[:, 3], points[:, 3])
+
+
+@pytest.mark.parametrize("backend", backends.available_backends())
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_backends_match_numpy(backend, dtype):
+    if backend != "numba_parallel":
+        check_backend_matches_numpy(backend, dtype)
+        return
+    # processes forked after a parallel kernel ran hang with the default
+    # threading layer, so parallel kernels are checked in a fresh process
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        pool.apply(check_backend_matches_numpy, (backend, dtype))
+
+
+def test_backend_registry(monkeypatch):
+    monkeypatch.setitem(backends.IMPLEMENTATIONS, "test", {})
+    active = backends.get_backend()
+    with pytest.raises(ValueError):
+        backends.set_backend("unknown")
+    with pytest.raises(ValueError):
+        backends.get_implementation("unknown")
+
+    @backends.register("test", "scale")
+    def scale(points, scale_factor=(1, 1, 1)):
+        return "test"
+
+    assert "test" in backends.available_backends()
+    assert backends.get_implementation("scale", "test") is scale
+    numpy_crop = backends.get_implementation("crop", "numpy")
+    assert backends.get_implementation("crop", "test") is numpy_crop
+    try:
+        backends.set_backend("test")
+        assert backends.get_backend() == "test"
+        assert F.scale(np.zeros((1, 3))) == "test"
+        assert F.crop(np.zeros((1, 3)), 0, 0, 0, 1, 1, 1).tolist() == [True]
+    finally:
+        backends.set_backend(active)
+
+
+def test_gather_checks_indexes():
+    values = np.arange(10.0)
+    pool = thread_pool()
+    pool.open()
+    try:
+        assert F.gather(values, np.array([-1, 0, 3])).tolist() == [9.0, 0.0, 3.0]
+        with pytest.raises(IndexError):
+            F.gather(values, np.array([10]))
+        with pytest.raises(IndexError):
+            F.gather(values, np.array([-11]))
+    finally:
+        pool.close()
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+import volumentations as V
+import volumentations.io as vio
+
+
+def write_ply(path, vertices, byte_order="binary_little_endian", faces=None):
+    header = ["ply", "format {} 1.0".format(byte_order), "comment test"]
+    if faces is not None:
+        header.append("element face {}".format(len(faces)))
+        header.append("property list uchar int vertex_indices")
+        header.append("property uchar flags")
+    header.append("element vertex {}".format(len(vertices)))
+    types = {"f4": "float", "u1": "uchar", "i4": "int"}
+    for name in vertices.dtype.names:
+        header.append(
+            "property {} {}".format(types[vertices.dtype[name].str[1:]], name)
+        )
+    header.append("element face 0")
+    header.append("property list uchar int vertex_indices")
+    header.append("end_header")
+    with open(path, "wb") as f:
+        f.write(("\n".join(header) + "\n").encode("ascii"))
+        for face in faces or []:
+            f.write(np.uint8(len(face)).tobytes())
+            f.write(np.array(face, dtype="<i4").tobytes())
+            f.write(np.uint8(7).tobytes())
+        f.write(vertices.tobytes())
+
+
+def test_read_kitti_bin(tmp_path):
+    scan = np.random.random((100, 4)).astype(np.float32)
+    path = str(tmp_path / "scan.bin")
+    scan.tofile(path)
+    data = vio.read(path)
+    assert np.array_equal(data["points"], scan[:, :3])
+    assert np.array_equal(data["features"], scan[:, 3:])
+    assert np.may_share_memory(data["points"], data["features"])
+
+
+def test_read_ply(tmp_path):
+    dtype = [
+        ("x", "<f4"),
+        ("y", "<f4"),
+        ("z", "<f4"),
+        ("nx", "<f4"),
+        ("ny", "<f4"),
+        ("nz", "<f4"),
+        ("red", "u1"),
+        ("green", "u1"),
+        ("blue", "u1"),
+        ("label", "<i4"),
+    ]
+    vertices = np.zeros(50, dtype=dtype)
+    for name in vertices.dtype.names:
+        vertices[name] = np.random.randint(0, 100, 50)
+    path = str(tmp_path / "cloud.ply")
+    write_ply(path, vertices)
+    data = vio.read(path)
+    assert np.array_equal(data["points"][:, 1], vertices["y"])
+    assert np.array_equal(data["normals"][:, 2], vertices["nz"])
+    assert np.array_equal(data["features"][:, 0], vertices["red"])
+    assert np.array_equal(data["labels"], vertices["label"])
+    assert np.may_share_memory(data["points"], data["labels"])
+
+    data = V.Compose([V.Scale3d(scale_limit=(0, 0, 0), bias=(2, 2, 2), p=1)])(**data)
+    assert np.array_equal(data["points"][:, 0], 2 * vertices["x"])
+    assert np.array_equal(vio.read(path)["points"][:, 0], vertices["x"])
+
+
+def test_read_ply_faces_before_vertices(tmp_path):
+    vertices = np.zeros(10, dtype=[("x", "<f4"), ("y", "<f4"), ("z", "<f4")])
+    vertices["y"] = np.arange(10)
+    path = str(tmp_path / "mesh.ply")
+    write_ply(path, vertices, faces=[[0, 1, 2], [2, 3, 4, 5]])
+    assert np.array_equal(vio.read(path)["points"][:, 1], np.arange(10))
+
+
+def test_read_ply_big_endian(tmp_path):
+    vertices = np.zeros(10, dtype=[("x", ">f4"), ("y", ">f4"), ("z", ">f4")])
+    vertices["z"] = np.arange(10)
+    path = str(tmp_path / "cloud.ply")
+    write_ply(path, vertices, byte_order="binary_big_endian")
+    assert np.array_equal(vio.read(path)["points"][:, 2], np.arange(10))
+
+
+def test_read_npy_npz(tmp_path):
+    points = np.random.random((100, 6))
+    labels = np.arange(100)
+    np.save(str(tmp_path / "cloud.npy"), points)
+    data = vio.read_npy(
+        str(tmp_path / "cloud.npy"),
+        columns={"points": slice(0, 3), "normals": slice(3, 6)},
+    )
+    assert np.array_equal(data["normals"], points[:, 3:])
+    np.savez(str(tmp_path / "stored.npz"), points=points, labels=labels)
+    np.savez_compressed(str(tmp_path / "compressed.npz"), points=points, labels=labels)
+    for name in ("stored.npz", "compressed.npz"):
+        data = vio.read(str(tmp_path / name))
+        assert np.array_equal(data["points"], points)
+        assert np.array_equal(data["labels"], labels)
+    assert isinstance(vio.read(str(tmp_path / "stored.npz"))["points"], np.memmap)
+
+
+def test_read_unknown_extension():
+    with pytest.raises(ValueError):
+        vio.read("cloud.xyz")
+
+
+def test_prefetch(tmp_path):
+    paths = []
+    for idx in range(10):
+        path = str(tmp_path / "{}.npy".format(idx))
+        np.save(path, np.full((5, 3), idx, dtype=float))
+        paths.append(path)
+    clouds = list(vio.prefetch(paths, workers=3, readahead=4))
+    assert [cloud["points"][0, 0] for cloud in clouds] == list(range(10))
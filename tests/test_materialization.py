@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+import volumentations as V
+
+
+def make_dataset(n_samples=5):
+    return [
+        {
+            "points": np.random.random((10 + i, 3)),
+            "labels": np.arange(10 + i),
+        }
+        for i in range(n_samples)
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_materialize(tmp_path, workers):
+    dataset = make_dataset()
+    pipeline = V.Compose([V.RandomDropout3d(dropout_ratio=0.3, p=1), V.Move3d()])
+    result = V.materialize(
+        pipeline,
+        dataset,
+        k=3,
+        out_dir=str(tmp_path),
+        workers=workers,
+        samples_per_shard=2,
+    )
+    assert len(result) == 15
+    assert len(result.shards) == 3
+    for idx in range(len(result)):
+        source = result.source(idx)
+        assert source == idx // 3
+        sample = result[idx]
+        assert isinstance(sample["points"], np.memmap)
+        assert len(sample["points"]) == len(sample["labels"])
+        replayed = V.ReplayCompose.replay(
+            result.replay(idx), **{t: v.copy() for t, v in dataset[source].items()}
+        )
+        assert np.allclose(replayed["points"], sample["points"])
+        assert np.array_equal(replayed["labels"], sample["labels"])
+
+
+def test_materialize_keeps_pipeline(tmp_path):
+    pipeline = V.Compose([V.RandomDropout3d(p=1), V.Move3d()])
+    V.materialize(pipeline, make_dataset(2), 2, str(tmp_path))
+    data = pipeline(points=np.random.random((10, 3)))
+    assert "replay" not in data
+    assert not pipeline.transforms[0].deterministic
+
+
+def test_materialize_reopen(tmp_path):
+    dataset = make_dataset(2)
+    written = V.materialize(V.Compose([V.Move3d()]), dataset, 2, str(tmp_path))
+    loaded = V.MaterializedDataset(str(tmp_path))
+    assert len(loaded) == 4
+    assert np.array_equal(loaded[-1]["points"], written[3]["points"])
+    assert loaded.manifest["pipeline"]["transform"]["__class_fullname__"].endswith(
+        "Compose"
+    )
+    with pytest.raises(IndexError):
+        loaded[4]
+
+
+def test_materialize_seed(tmp_path):
+    dataset = make_dataset(2)
+    pipeline = V.Compose([V.RandomDropout3d(p=1), V.Scale3d(p=1)])
+    first = V.materialize(pipeline, dataset, 2, str(tmp_path / "a"), seed=1)
+    second = V.materialize(pipeline, dataset, 2, str(tmp_path / "b"), seed=1)
+    other = V.materialize(pipeline, dataset, 2, str(tmp_path / "c"), seed=2)
+    for idx in range(len(first)):
+        assert np.array_equal(first[idx]["points"], second[idx]["points"])
+    assert not all(
+        np.array_equal(first[idx]["labels"], other[idx]["labels"])
+        for idx in range(len(first))
+    )
+
+
+def test_materialize_keeps_random_state(tmp_path):
+    dataset = make_dataset(2)
+    np.random.seed(3)
+    expected = np.random.random()
+    np.random.seed(3)
+    V.materialize(V.Compose([V.Scale3d(p=1)]), dataset, 2, str(tmp_path))
+    assert np.random.random() == expected
+
+
+def test_materialize_missing_targets(tmp_path):
+    dataset = [
+        {"points": np.random.random((3, 3))},
+        {"points": np.random.random((4, 3)), "labels": np.arange(4)},
+        {"points": np.random.random((5, 3)), "features": np.zeros((0, 2))},
+    ]
+    result = V.materialize(V.Compose([V.Move3d()]), dataset, 1, str(tmp_path))
+    assert len(result[0]["labels"]) == 0
+    assert np.array_equal(result[1]["labels"], np.arange(4))
+    assert len(result[2]["labels"]) == 0
+    assert len(result[2]["points"]) == 5
+    assert result[2]["features"].shape == (0, 2)
+    assert result[0]["features"].shape == (0, 2)
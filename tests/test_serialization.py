@@ -50,6 +50,16 @@ AUGMENTATION_CLS_PARAMS = (
         [V.Move3d, {}],
         [V.Center3d, {}],
         [V.RandomDropout3d, {"dropout_ratio": 0}],
+        [V.VoxelDownsample3d, {"voxel_size": 0.1, "reduce": "random"}],
+        [V.FarthestPointSample3d, {"n_points": 50, "method": "grid"}],
+        [V.ElasticDistortion3d, {"granularity": 0.1, "magnitude": 0.2}],
+        [V.Jitter3d, {"sigma": 0.1, "clip": 0.2}],
+        [V.IntensityScale3d, {"scale_limit": 0.2, "columns": [0]}],
+        [V.RandomSymmetry3d, {"axes": [0, 1]}],
+        [V.RandomPatchDropout3d, {"n_patches": 3, "radius": 0.1}],
+        [V.RandomCropToSize3d, {"n_points": 50}],
+        [V.SpatialSort3d, {"order": "hilbert", "bits": 10}],
+        [V.BeamDownsample3d, {"target_beams": 2, "n_beams": 8}],
     ],
 )
 
@@ -129,3 +139,38 @@ def test_transform_pipeline_serialization(seed, points):
     set_seed(seed)
     deserialized_aug_data = deserialized_aug(points=points)
     assert np.array_equal(aug_data["points"], deserialized_aug_data["points"])
+
+
+@pytest.mark.parametrize("seed", TEST_SEEDS)
+def test_some_of_random_order_serialization(seed, points):
+    aug = V.Compose(
+        [
+            V.SomeOf(
+                [V.Flip3d(p=0.2), V.RandomMove3d(p=0.5), V.RotateAroundAxis3d()],
+                n=2,
+            ),
+            V.SomeOf([V.RandomMove3d(), V.Flip3d()], n=2, replace=True),
+            V.RandomOrder([V.RandomMove3d(p=1), V.RotateAroundAxis3d(p=1)]),
+        ]
+    )
+    serialized_aug = V.to_dict(aug)
+    deserialized_aug = V.from_dict(serialized_aug)
+    set_seed(seed)
+    aug_data = aug(points=points.copy())
+    set_seed(seed)
+    deserialized_aug_data = deserialized_aug(points=points.copy())
+    assert np.array_equal(aug_data["points"], deserialized_aug_data["points"])
+
+
+def test_compose_layout_serialization():
+    layout = V.PointLayout(points=(0, 3), normals=(3, 6), labels=6)
+    aug = V.Compose([V.RandomDropout3d(p=1), V.Move3d()], layout=layout)
+    serialized = V.to_dict(aug)
+    assert serialized["transform"]["layout"] == {
+        "points": [0, 3],
+        "normals": [3, 6],
+        "labels": 6,
+    }
+    deserialized = V.from_dict(serialized)
+    assert deserialized.layout == layout
+    assert deserialized.transforms[0].layout == layout